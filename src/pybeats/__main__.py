@@ -1,10 +1,124 @@
-from .app import App
-from .states.loading import Loading
+import argparse
+import os
+import sys
+from typing import List
+
+
+def beatmap_names(paths: List[str]) -> List[str]:
+    """
+    The beatmaps named on the command line, or every one in beatmaps/ if none were
+    """
+    from .conf import Conf
+
+    return [os.path.basename(os.path.normpath(path)) for path in paths] or sorted(
+        entry.name for entry in os.scandir(f"{Conf.ROOT_DIR}/beatmaps") if os.path.exists(f"{entry.path}/meta.toml")
+    )
 
 
 def main() -> None:
-    Game = App(Loading)
-    Game.run()
+    parser = argparse.ArgumentParser(prog="pybeats", description="A 2D rhythm game. Run without a command to play.")
+    commands = parser.add_subparsers(dest="command")
+
+    pack = commands.add_parser("pack", help="pack a directory of numbered MV frames into a single file")
+    pack.add_argument("frames_path", help="directory holding {image_name}1.jpg, {image_name}2.jpg, ...")
+    pack.add_argument("image_name", help="prefix of the frame file names")
+    pack.add_argument("-o", "--out", help="output file (default: frames_path.pbv)")
+
+    compile = commands.add_parser("compile", help="validate beatmaps and compile their charts ahead of time")
+    compile.add_argument("beatmaps", nargs="*", help="beatmap directories (default: every one in beatmaps/)")
+    compile.add_argument("-j", "--processes", type=int, help="worker processes (default: one per core)")
+
+    analyse = commands.add_parser("analyse", help="measure the density of charts and estimate their difficulty")
+    analyse.add_argument("beatmaps", nargs="*", help="beatmap directories (default: every one in beatmaps/)")
+    analyse.add_argument("-j", "--processes", type=int, help="worker processes (default: one per core)")
+
+    replay = commands.add_parser("replay", help="play back a replay through the game's judgement")
+    replay.add_argument("file", help="a .pbr file from the replays directory")
+    replay.add_argument(
+        "--headless",
+        action="store_true",
+        help="judge it as fast as possible without a window, and exit non-zero if the result differs from the "
+        "recorded one",
+    )
+
+    args = parser.parse_args()
+
+    match args.command:
+        case "pack":
+            from .video import pack_frames
+
+            out = args.out or f"{args.frames_path.rstrip('/')}.pbv"
+            frame_count = pack_frames(args.frames_path, args.image_name, out)
+            print(f"Packed {frame_count} frames into {out}")
+        case "compile":
+            from .charts import compile_all
+            from .lib import green, red
+
+            songs = beatmap_names(args.beatmaps)
+
+            failed = 0
+            for song, errors, warnings in compile_all(songs, args.processes):
+                print(errors and red(f"✗ {song}") or green(f"✓ {song}"))
+                for error in errors:
+                    print(red(f"    error: {error}"))
+                for warning in warnings:
+                    print(f"    warning: {warning}")
+
+                failed += bool(errors)
+
+            print(f"Compiled {len(songs) - failed} of {len(songs)} beatmaps")
+
+            if failed:
+                sys.exit(1)
+        case "analyse":
+            from .analytics import NPS_WINDOW, analyse_all
+
+            for song, charts in analyse_all(beatmap_names(args.beatmaps), args.processes):
+                print(song)
+                for difficulty, (listed, stats) in charts.items():
+                    if stats is None:
+                        print(f"    {difficulty:<7} no chart yet")
+                        continue
+
+                    chords = " ".join(f"{size}:{count}" for size, count in stats.chords.items())
+                    print(
+                        f"    {difficulty:<7} level {listed:>2}  estimate {stats.estimate:>4}  "
+                        f"{stats.notes} notes over {stats.duration:.1f}s  "
+                        f"nps {stats.mean_nps:.2f} (peak {stats.peak_nps:.0f} per {NPS_WINDOW:g}s)  "
+                        f"chords {chords}  holds {stats.hold_coverage:.0%}  balance {stats.lane_balance:.2f}"
+                    )
+        case "replay":
+            from .conf import Conf
+            from .replay import Replay
+
+            recorded = Replay.load(args.file)
+
+            if args.headless:
+                os.environ["SDL_VIDEODRIVER"] = "dummy"
+                os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+            # Notes move at a speed that depends on the resolution, so judge at the one the replay was recorded at
+            Conf.RENDER_RESOLUTION = tuple(recorded.settings["resolution"])  # type: ignore
+            Conf.NOTE_ENGINE = recorded.settings["note_engine"]
+
+            from .app import App
+            from .states.loading import Loading
+
+            Game = App(Loading)
+            result = Game.play_replay(recorded, realtime=not args.headless)
+
+            print(f"Recorded: {recorded.result}")
+            print(f"Replayed: {result}")
+
+            if result != recorded.result:
+                sys.exit(1)
+        case _:
+            # Importing the game opens pygame, so only do it when actually playing
+            from .app import App
+            from .states.loading import Loading
+
+            Game = App(Loading)
+            Game.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+from .charts import DIFFICULTIES, LANES
+from .lib import NoteData, fetch_song_data
+
+# Seconds of chart the notes per second are counted over
+NPS_WINDOW = 1.0
+
+# What each stat adds to ChartStats.estimate per unit of it. Picked by hand; the estimate is only ever rough
+MEAN_NPS_WEIGHT = 1.6
+PEAK_NPS_WEIGHT = 0.8
+# Per note a chord has beyond the first, on average
+CHORD_WEIGHT = 1.5
+HOLD_COVERAGE_WEIGHT = 2.0
+LANE_BALANCE_WEIGHT = 2.0
+
+
+class ChartStats:
+    """
+    Density and shape of one chart, worked out from its notes alone
+    """
+
+    def __init__(self, note_data: NoteData, bpm: int) -> None:
+        # Beats in a chart are counted at the same bpm Conductor plays it at
+        sec_per_beat = 60 / bpm
+
+        beats: List[int] = []
+        lanes: List[int] = []
+        widths: List[int] = []
+        holds: List[bool] = []
+        lengths: List[int] = []
+
+        for beat, notes in note_data.notes.items():
+            for note in notes:
+                beats.append(int(beat))
+                lanes.append(note.lane)
+                widths.append(note.width)
+                holds.append(note.type == "h")
+                lengths.append(note.length)
+
+        times = numpy.array(beats, numpy.float64) * sec_per_beat
+        lane = numpy.array(lanes, numpy.int64)
+        width = numpy.array(widths, numpy.int64)
+        hold = numpy.array(holds, bool)
+        length = numpy.array(lengths, numpy.float64) * sec_per_beat
+
+        self.notes = len(times)
+        self.duration = float(times[-1] - times[0]) if self.notes > 1 else 0.0
+
+        # Notes in the window starting at each note; times are in chart order, which compile checks is ascending
+        in_window = numpy.searchsorted(times, times + NPS_WINDOW, side="left") - numpy.arange(self.notes)
+        self.peak_nps = float(in_window.max(initial=0)) / NPS_WINDOW
+        self.mean_nps = self.duration and self.notes / self.duration or 0.0
+
+        # How many notes land on each beat, then how many beats have 1, 2, 3... notes
+        _, chord_sizes = numpy.unique(times, return_counts=True)
+        self.chords: Dict[int, int] = {
+            size: int(count) for size, count in enumerate(numpy.bincount(chord_sizes)) if size and count
+        }
+        self.mean_chord = float(chord_sizes.mean()) if len(chord_sizes) else 0.0
+
+        # Share of the chart spent holding something, overlapping holds counted once
+        self.hold_coverage = 0.0
+        if hold.any() and self.duration:
+            starts = times[hold]
+            ends = starts + length[hold]
+            order = numpy.argsort(starts)
+            starts, ends = starts[order], numpy.maximum.accumulate(ends[order])
+            # A hold only adds the part that starts after every hold before it has ended
+            covered = ends - numpy.maximum(starts, numpy.concatenate(([starts[0]], ends[:-1])))
+            self.hold_coverage = float(numpy.clip(covered, 0, None).sum()) / self.duration
+
+        # Every lane a note covers, weighted equally; 1 when all 8 lanes are used as much as each other
+        covered_lanes = numpy.repeat(lane, width) + (
+            numpy.arange(width.sum()) - numpy.repeat(numpy.cumsum(width) - width, width)
+        )
+        self.lane_usage = numpy.bincount(covered_lanes - 1, minlength=LANES)[:LANES]
+        share = self.lane_usage / max(self.lane_usage.sum(), 1)
+        share = share[share > 0]
+        self.lane_balance = float(-(share * numpy.log(share)).sum() / numpy.log(LANES))
+
+    @property
+    def estimate(self) -> float:
+        """
+        A difficulty on roughly the same scale as SongData.difficulty
+
+        Density matters most, and peaks more than the average. Chords and holds add to it, and a chart that keeps to a
+        few lanes is easier to read than one spread across all of them
+        """
+        return round(
+            MEAN_NPS_WEIGHT * self.mean_nps
+            + PEAK_NPS_WEIGHT * self.peak_nps
+            + CHORD_WEIGHT * (self.mean_chord - 1)
+            + HOLD_COVERAGE_WEIGHT * self.hold_coverage
+            + LANE_BALANCE_WEIGHT * self.lane_balance,
+            1,
+        )
+
+
+def analyse_song(song: str) -> Tuple[str, Dict[str, Tuple[int, Optional[ChartStats]]]]:
+    """
+    Difficulty => (its listed level, stats of its chart); the stats are None while the chart is only a placeholder note
+
+    *Runs in a worker process
+    """
+    data = fetch_song_data(song)
+    charts: Dict[str, Tuple[int, Optional[ChartStats]]] = {}
+
+    for difficulty in DIFFICULTIES:
+        chart: NoteData = getattr(data, f"map_{difficulty}")
+        stats = len(chart.notes) > 1 and ChartStats(chart, data.bpm_semiquaver) or None
+        charts[difficulty] = (getattr(data.difficulty, difficulty), stats)
+
+    return (song, charts)
+
+
+def analyse_all(
+    songs: List[str], processes: Optional[int] = None
+) -> List[Tuple[str, Dict[str, Tuple[int, Optional[ChartStats]]]]]:
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(analyse_song, songs))
@@ -1,29 +1,33 @@
 from __future__ import annotations
 
+import atexit
 import os
 import sys
-import requests
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BytesIO
 from abc import ABC, abstractmethod
 from math import floor
-from threading import Thread
-from typing import Dict, List, Literal, Optional, Tuple, Type
+from typing import Any, BinaryIO, Dict, List, Literal, Optional, Tuple, Type
 
 import pygame as pg
 from pygame import font, mixer
 from pygame.surface import Surface
 
+from .audio import ChordMixer, HoldSoundBank, Priority, SoundCache, VoiceManager, setup_mixer
+from .avatars import AvatarFetcher
+from .calibration import Calibration
 from .conf import Conf
-from .lib import Difficulty, NoteData, SongData, fetch_song_data, green, panic, red, save_song_data, screen_res
+from .memory import ImageCache, MemoryBudget, surfaces_size
+from .pacing import FramePacer
+from .lib import Difficulty, NoteData, SongData, fetch_song_data, green, panic, red, screen_res
+from .replay import Replay, chart_hash
+from .scorestore import ScoreStore
+from .writer import Writer
+from .video import SharedMemoryVideo, Video, open_frames
 
 pg.init()
 
-mixer.pre_init(Conf.SOUND_BUFFER_SIZE)
-mixer.set_reserved(1)
-mixer.set_reserved(2)
-mixer.set_reserved(3)
-mixer.set_num_channels(Conf.MIXER_CHANNELS)
-
 font.init()
 
 from pybeats import ROOT_DIR
@@ -36,6 +40,10 @@ class MixerWrapper:
         self.paused: bool = False
         self.playing: bool = False
 
+        # Preview tracks are decoded up front and looped by the mixer itself
+        self.loop_channel = mixer.Channel(1)
+        self.volume: float = 1.0
+
     def toggle_pause(self) -> None:
         if self.playing:
             if self.paused:
@@ -48,24 +56,44 @@ class MixerWrapper:
             self.playing = True
 
     @staticmethod
-    def load(song_file: str) -> None:
+    def load(song_file: str | BinaryIO) -> None:
         mixer.music.load(song_file)
 
-    @staticmethod
-    def unload() -> None:
+    def unload(self) -> None:
         mixer.music.unload()
+        self.loop_channel.stop()
 
     @staticmethod
     def play() -> None:
         mixer.music.play()
 
-    @staticmethod
-    def set_volume(volume: float) -> None:
-        mixer.music.set_volume(volume)
+    def play_loop(self, track: mixer.Sound, loops: int = -1) -> None:
+        """
+        Plays an already decoded track, looping it forever by default
+        """
+        mixer.music.unload()
+        self.loop_channel.set_volume(self.volume)
+        self.loop_channel.play(track, loops=loops)
 
-    @staticmethod
-    def get_volume() -> float:
-        return mixer.music.get_volume()
+    def stream(self, path: str, loops: int = -1) -> None:
+        """
+        Streams a track from disk, for ones too long to decode up front or not decoded yet
+        """
+        self.loop_channel.stop()
+        mixer.music.load(path)
+        mixer.music.set_volume(self.volume)
+        mixer.music.play(loops)
+
+    def busy(self) -> bool:
+        return mixer.music.get_busy() or self.loop_channel.get_busy()
+
+    def set_volume(self, volume: float) -> None:
+        self.volume = min(max(volume, 0.0), 1.0)
+        mixer.music.set_volume(self.volume)
+        self.loop_channel.set_volume(self.volume)
+
+    def get_volume(self) -> float:
+        return self.volume
 
     @staticmethod
     def get_music_pos() -> int:
@@ -75,7 +103,9 @@ class MixerWrapper:
     def play_sfx(sfx: mixer.Sound, channel: Optional[mixer.Channel] = None) -> None:
         if channel:
             channel.play(sfx)
-        mixer.find_channel().play(sfx)
+        # Steal the longest playing UI channel rather than skip the sound
+        elif channel := mixer.find_channel(True):
+            channel.play(sfx)
 
 
 class Conductor:
@@ -89,43 +119,62 @@ class Conductor:
         self.beat_count = 0
         self.difficulty = difficulty
 
+        # Seconds the player hears the song and sees the notes behind the game; InGame starts the song and draws the
+        # notes that much early
+        self.audio_offset, self.visual_offset = self.ctx.calibration.offsets(self.ctx.audio.latency)
+
         # self.played: bool = False
 
         self.note_data = note_data
         self.__notes_iter = iter(self.note_data.notes)
         self.final_note_beat: str = list(self.note_data.notes)[-1]
+        # Every note is judged exactly once, which is how InGame knows the song is over
+        self.note_count = sum(len(notes) for notes in self.note_data.notes.values())
+
+        # Load every hold sound this chart needs now, so hitting a hold never touches the disk
+        if song not in self.ctx.hold_banks:
+            self.ctx.hold_banks[song] = HoldSoundBank(
+                f"{ROOT_DIR}/beatmaps/{song}/holdbeats", self.ctx.sfx.hold, self.sec_per_beat, self.ctx.memory
+            )
+        self.hold_sounds = self.ctx.hold_banks[song]
+        self.hold_sounds.pin()
+        self.hold_sounds.preload(
+            note.length for notes in self.note_data.notes.values() for note in notes if note.type == "h"
+        )
 
     @property
     def next_note_beat(self) -> str:
         return next(self.__notes_iter)
 
     def play_hit_sounds(self, notes: List[NoteObject], grade: str) -> None:
-        channels: list[mixer.Channel] = []
-        for _ in range(len(notes)):
-            channels.append(mixer.find_channel())
+        voices = self.ctx.voices
 
-        for idx, note in enumerate(notes):
+        # Everything but holds is mixed into one sound for the whole judgement
+        samples: Dict[str, int] = {}
+        priority = Priority.Tap
+
+        for note in notes:
             match note.type:
                 case "t":
-                    if grade == "PERFECT":
-                        channels[idx].play(self.ctx.sfx.tap_perfect)
-                    else:
-                        channels[idx].play(self.ctx.sfx.tap_etc)
-
+                    sample = grade == "PERFECT" and "tap_perfect" or "tap_etc"
                 case "tc":
-                    channels[idx].play(self.ctx.sfx.tap_crit)
+                    sample = "tap_crit"
+                    priority = Priority.Crit
                 case "f":
-                    channels[idx].play(self.ctx.sfx.flair)
+                    sample = "flair"
                 case "fc":
-                    channels[idx].play(self.ctx.sfx.flair_crit)
+                    sample = "flair_crit"
+                    priority = Priority.Crit
                 case "h":
-                    # TODO: For now there will only be one hold note at a time, but figure out how to distribute channels for multiple holds later
-                    self.ctx.HoldHeadChannel.play(self.ctx.sfx.tap_perfect)
-                    self.ctx.HoldChannel.play(
-                        mixer.Sound(f"{ROOT_DIR}/beatmaps/{self.song}/holdbeats/hold_{notes[0].length}.wav")
-                    )
-                case "hr":
-                    channels[idx].play(self.ctx.sfx.tap_perfect)
+                    voices.play_hold(note.lane.id, self.ctx.sfx.tap_perfect, self.hold_sounds[note.length])
+                    continue
+                case _:
+                    sample = "tap_perfect"
+
+            samples[sample] = samples.get(sample, 0) + 1
+
+        if samples:
+            voices.play(self.ctx.chords[tuple(sorted(samples.items()))], priority)
 
     def update(self) -> None:
         self.pos = mixer.music.get_pos()
@@ -140,68 +189,10 @@ class Conductor:
             # self.played = False
 
 
-class Video:
-    def __init__(self, ctx: App, rpath: str, image_name: str) -> None:
-        self.ctx = ctx
-        self.frames_path = f"{ROOT_DIR}/{rpath}"
-        self.image_name = image_name
-
-        self.frames: Dict[int, Surface] = {}
-
-        self.frame_count = len(os.listdir(self.frames_path))
-
-        self.load_curr: int = 1
-
-    def load_and_scale(self, path: str) -> Surface:
-        frame = pg.image.load(path)
-        frame = pg.transform.scale(frame, (self.ctx.SCREEN_WIDTH, self.ctx.SCREEN_HEIGHT)).convert_alpha()
-        frame.set_alpha(30)
-        return frame
-
-    def load_next(self, adder: int) -> None:
-        # An adder is used so a Mutex is not necessary
-
-        frame = self.load_and_scale(f"{self.frames_path}/{self.image_name}{self.load_curr + adder}.jpg")
-
-        # Simulate List like indexing
-        self.frames[self.load_curr + adder] = frame
-
-    def load_chunk_buf(self) -> None:
-        # Finished loading
-        if self.load_curr > self.frame_count:
-            return
-
-        threads: List[Thread] = []
-
-        # Use Conf.MAX_ALLOWED_THREADS, but if the number of images left to be loaded is less than Conf.MAX_ALLOWED_THREADS use that.
-        max_threads = (
-            (self.frame_count - self.load_curr > Conf.MAX_ALLOWED_THREADS)
-            and Conf.MAX_ALLOWED_THREADS
-            or self.frame_count - self.load_curr + 1
-        )
-
-        for i in range(0, max_threads):
-            thread = Thread(target=self.load_next, args=(i,))
-            threads.append(thread)
-            thread.start()
-
-        for thread in threads:
-            thread.join()
-
-        self.load_curr += Conf.MAX_ALLOWED_THREADS
-
-    def unload(self) -> None:
-        """
-        Frees the memory being consumed by Video.frames
-
-        *Call gc.collect() immediately after calling this method
-        """
-        self.frames = {}
-        self.load_curr = 1
-
-
 class State(ABC):
     _ctx: App
+    # Built once and kept in ctx.states, so coming back to it only runs enter()
+    persistent = False
 
     def __init__(self, ctx: App) -> None:
         self.ctx = ctx
@@ -214,6 +205,30 @@ class State(ABC):
     def ctx(self, ctx: App) -> None:
         self._ctx = ctx
 
+    @staticmethod
+    def prepare(ctx: App) -> Dict[str, Any]:
+        """
+        Does the file reading __init__ would otherwise wait on, e.g. loading music into memory. __init__ finds what
+        this returns in ctx.prepared
+
+        *Runs on a worker thread while the screen fades out to this State, so must stick to files and plain Python.
+        Images, fonts and anything else SDL stay in __init__, on the main thread
+        """
+        return {}
+
+    def enter(self) -> None:
+        """
+        Resets whatever changes while the State is shown, e.g. hover flags and music. Called every time it's switched
+        to, including just after __init__
+        """
+        ...
+
+    def exit(self) -> None:
+        """
+        Called as the State is switched away from
+        """
+        ...
+
     @abstractmethod
     def update(self) -> None:
         """
@@ -233,6 +248,51 @@ class State(ABC):
         ...
 
 
+class StatePreparer:
+    """
+    Runs State.prepare for the State being faded to on a background thread, so the frame that switches to it doesn't
+    wait on the disk
+    """
+
+    def __init__(self) -> None:
+        self.pool = ThreadPoolExecutor(1, thread_name_prefix="prepare")
+        self.state: Optional[Type[State]] = None
+        self.future: Optional[Future[Dict[str, Any]]] = None
+
+    def start(self, ctx: App, state: Type[State]) -> None:
+        if self.state is state:
+            return
+
+        self.state = state
+        self.future = self.pool.submit(state.prepare, ctx)
+
+    def take(self, ctx: App, state: Type[State]) -> Dict[str, Any]:
+        """
+        What state.prepare returned, waiting for it if it's still running. Prepared there and then if it was never
+        started, e.g. for the first State
+        """
+        prepared_state, future = self.state, self.future
+        self.state = self.future = None
+
+        # Something else was being prepared; its result is of no use
+        if future is None or prepared_state is not state:
+            return state.prepare(ctx)
+
+        return future.result()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Keys of lanes 1 to 8
+LANE_KEYS = (pg.K_a, pg.K_s, pg.K_d, pg.K_f, pg.K_j, pg.K_k, pg.K_l, pg.K_SEMICOLON)
+
+# Alpha per second
+FADE_SPEED = 300
+# Volume per second
+VOLUME_FADE_SPEED = 1.2
+
+
 class FadeOverlay:
     """
     This is probably 'overcoded' but it works...
@@ -241,7 +301,7 @@ class FadeOverlay:
     def __init__(self, ctx: App, mode: Optional[Literal["in", "out"]]) -> None:
         self.ctx = ctx
         self.mode = mode
-        self.fade_alpha: int = mode == "in" and 255 or 0
+        self.fade_alpha: float = mode == "in" and 255 or 0
         self.fade_overlay = Surface((self.ctx.SCREEN_WIDTH, self.ctx.SCREEN_HEIGHT))
         self.fade_overlay.fill((0, 0, 0))
 
@@ -251,23 +311,26 @@ class FadeOverlay:
         self.adjust_volume_flag: bool = False
 
     def fadein(self) -> None:
-        self.fade_alpha -= floor(5 * self.ctx.dt)
+        self.fade_alpha -= FADE_SPEED * self.ctx.dt
 
-        self.fade_overlay.set_alpha(self.fade_alpha)
+        self.fade_overlay.set_alpha(max(floor(self.fade_alpha), 0))
         if self.fade_alpha <= 0:
             self.set_mode(None)
             self.adjust_volume_flag = False
 
     def fadeout(self) -> None:
-        self.fade_alpha += floor(5 * self.ctx.dt)
+        self.fade_alpha += FADE_SPEED * self.ctx.dt
 
         if self.adjust_volume_flag:
-            self.ctx.mixer.set_volume(self.ctx.mixer.get_volume() - 0.02)
+            self.ctx.mixer.set_volume(self.ctx.mixer.get_volume() - VOLUME_FADE_SPEED * self.ctx.dt)
 
-        self.fade_overlay.set_alpha(self.fade_alpha)
+        self.fade_overlay.set_alpha(min(floor(self.fade_alpha), 255))
 
     def fade_to_state(self, state: Type[State]) -> None:
         self.set_mode("out")
+        # A State that's already built has nothing left to prepare
+        if state not in self.ctx.states:
+            self.ctx.preparer.start(self.ctx, state)
 
         if state == SongSelect:
             self.adjust_volume_flag = True
@@ -304,12 +367,13 @@ class FadeOverlay:
             return
 
         self.mode = mode
-        self.fade_alpha: int = mode == "in" and 255 or 0
+        self.fade_alpha = mode == "in" and 255 or 0
 
         self.has_toggled_mode = True
 
 
-from .states.ingame import InGame, NoteObject
+from .states.calibrate import Calibrate
+from .states.ingame import InGame, NoteObject, NoteSprites
 from .states.loading import Loading
 from .states.menu import Menu
 from .states.songselect import SongSelect
@@ -320,7 +384,8 @@ class App:
     _state: State
 
     song_cache: Dict[str, SongData] = {}
-    image_cache: Dict[str, Surface] = {}
+    image_cache: ImageCache
+    hold_banks: Dict[str, HoldSoundBank] = {}
 
     song_names = ["dokuzu", "ghostrule"]
 
@@ -349,8 +414,15 @@ class App:
 
     video: Optional[Video] = None
     conductor: Optional[Conductor] = None
+    note_sprites: Optional[NoteSprites] = None
+    # When set, InGame plays this back instead of taking input
+    replay: Optional[Replay] = None
 
     def __init__(self, init_state: Type[State]) -> None:
+        self.memory = MemoryBudget(Conf.MEMORY_BUDGET)
+        self.image_cache = ImageCache(self.memory, self.load_image)
+        self.images_loaded: int = 0
+
         # Beatmap specific assets
         for beatmap in os.scandir(f"{ROOT_DIR}/beatmaps/"):
             print(beatmap.name)
@@ -371,20 +443,40 @@ class App:
                         )
                     )
         #
-        self.dt = 1
-        self.HoldChannel = mixer.Channel(1)
-        self.HoldHeadChannel = mixer.Channel(2)
-        self.LeadPauseChannel = mixer.Channel(3)
-
-        self.SCREEN_WIDTH, self.SCREEN_HEIGHT = screen_res(pg.display.Info())
-
-        self.Display = pg.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT), Conf.FLAGS, 16)
+        # Seconds the last frame took
+        self.dt = 1 / Conf.TARGET_FPS
+        # Reopens the mixer pg.init() opened, with the settings and buffer size the profile asks for
+        self.audio = setup_mixer(Conf.AUDIO_PROFILE)
+        print(green(f"Audio: {self.audio}"))
+        self.LeadPauseChannel = mixer.Channel(0)
+        self.voices = VoiceManager(range(2, 2 + Conf.HIT_VOICES))
+
+        self.WINDOW_WIDTH, self.WINDOW_HEIGHT = screen_res(pg.display.Info())
+        # Everything is laid out and drawn at the render resolution, then scaled up to the window once a frame
+        self.SCREEN_WIDTH, self.SCREEN_HEIGHT = Conf.RENDER_RESOLUTION or (self.WINDOW_WIDTH, self.WINDOW_HEIGHT)
+
+        try:
+            vsync = self.open_window(Conf.FRAME_PACING == "vsync")
+        except pg.error:
+            # Not every renderer can do vsync
+            vsync = self.open_window(False)
         pg.display.set_caption("PyBeats")
 
-        self.Clock = pg.time.Clock()
+        self.pacer = FramePacer(
+            vsync and "vsync" or Conf.FRAME_PACING == "vsync" and "precise" or Conf.FRAME_PACING, Conf.TARGET_FPS
+        )
 
         self.mixer = MixerWrapper()
 
+        self.avatars = AvatarFetcher(f"{Conf.CACHE_DIR}/avatars")
+        self.scores = ScoreStore(f"{Conf.PROFILE_DIR}/{Conf.PROFILE}.db")
+        self.calibration = Calibration(f"{Conf.PROFILE_DIR}/{Conf.PROFILE}_calibration.toml")
+        self.writer = Writer()
+        # Whatever way the game exits, pending saves are written first
+        atexit.register(self.close)
+
+        self.sounds = SoundCache(Conf.AUDIO_CACHE_SIZE, self.memory)
+
         class Sfx:
             SFX_DIR = f"{ROOT_DIR}/audio/sfx"
             # Tap null
@@ -417,7 +509,21 @@ class App:
 
         self.sfx = Sfx
 
+        for name, sfx in vars(Sfx).items():
+            if isinstance(sfx, mixer.Sound):
+                self.memory.track("sfx", name, memoryview(sfx).nbytes)
+
+        self.chords = ChordMixer(
+            {name: getattr(Sfx, name) for name in ("tap_perfect", "tap_etc", "tap_crit", "flair", "flair_crit")},
+            self.memory,
+        )
+        # Charts rarely stack more than 4 notes on a beat
+        self.chords.precompute(range(2, 5))
+
         self.fader = FadeOverlay(ctx=self, mode=None)
+        self.preparer = StatePreparer()
+        self.prepared: Dict[str, Any] = {}
+        self.states: Dict[Type[State], State] = {}
 
         self.cursor = pg.image.load(f"{ROOT_DIR}/assets/cursor.jpg").convert_alpha()
         cursor_scale = self.cursor.get_width() / 40
@@ -432,15 +538,106 @@ class App:
 
         self.target_map: str = ""
 
+    def open_window(self, vsync: bool) -> bool:
+        """
+        Returns whether vsync was asked for. SDL only vsyncs windows it draws through a renderer, i.e. SCALED ones, so
+        it's never asked for with the others
+        """
+        unscaled = (self.SCREEN_WIDTH, self.SCREEN_HEIGHT) == (self.WINDOW_WIDTH, self.WINDOW_HEIGHT)
+
+        if unscaled and not vsync:
+            self.Window = self.Display = pg.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT), Conf.FLAGS, 16)
+        elif unscaled or Conf.RENDER_SCALING == "scaled":
+            # SDL scales the window up to fit the desktop on the GPU and maps the mouse back for us. An unscaled window
+            # is opened this way too when vsync is wanted, and just isn't scaled
+            self.Window = self.Display = pg.display.set_mode(
+                (self.SCREEN_WIDTH, self.SCREEN_HEIGHT), Conf.FLAGS | pg.SCALED, vsync=vsync
+            )
+            # SCALED sizes the window itself, to the largest whole multiple of the render resolution that fits, so
+            # 960x540 stays 960x540 on a 1600x900 desktop. SDL carries on scaling to whatever size it's given instead
+            try:
+                from pygame._sdl2.video import Window
+
+                Window.from_display_module().size = (self.WINDOW_WIDTH, self.WINDOW_HEIGHT)
+            except (ImportError, pg.error):
+                pass
+
+            return vsync
+        else:
+            # smoothscale only works on 24/32 bit surfaces
+            self.Window = pg.display.set_mode(
+                (self.WINDOW_WIDTH, self.WINDOW_HEIGHT), Conf.FLAGS, Conf.RENDER_SCALING == "smooth" and 32 or 16
+            )
+            self.Display = Surface((self.SCREEN_WIDTH, self.SCREEN_HEIGHT)).convert(self.Window)
+
+        return False
+
     def setState(self, state: Type[State]) -> None:
-        self._state = state(self)
+        if (current := getattr(self, "_state", None)) is not None:
+            current.exit()
+            if type(current) not in self.states:
+                self.memory.untrack("states", type(current).__name__)
+
+        if (instance := self.states.get(state)) is None:
+            self.prepared = self.preparer.take(self, state)
+            instance = state(self)
+            # Nothing prepared should outlive the State it was for
+            self.prepared = {}
+
+            if state.persistent:
+                self.states[state] = instance
+
+        self._state = instance
+        self._state.enter()
+        # Pinned, as a State draws its own surfaces every frame. Tracked on every visit, as enter() may change them
+        self.memory.track("states", state.__name__, surfaces_size(instance))
 
     def update(self) -> None:
         self._state.update()
 
+    def mouse_pos(self) -> Tuple[int, int]:
+        """
+        The mouse position in render resolution coordinates
+        """
+        x, y = pg.mouse.get_pos()
+
+        if self.Window is self.Display:
+            return (x, y)
+
+        return (x * self.SCREEN_WIDTH // self.WINDOW_WIDTH, y * self.SCREEN_HEIGHT // self.WINDOW_HEIGHT)
+
+    def present(self) -> None:
+        if self.Window is self.Display:
+            return
+
+        if Conf.RENDER_SCALING == "smooth":
+            pg.transform.smoothscale(self.Display, self.Window.get_size(), self.Window)
+        else:
+            pg.transform.scale(self.Display, self.Window.get_size(), self.Window)
+
     def draw(self) -> None:
         self._state.draw()
 
+    def load_avatars(self) -> None:
+        for key, data in self.avatars.poll():
+            try:
+                self.image_cache[key] = pg.image.load(BytesIO(data)).convert()
+            except pg.error:
+                # Not an image; keep the empty avatar
+                pass
+
+    def load_image(self, key: str) -> Surface:
+        """
+        Loads an image that isn't in (or was evicted from) the image cache
+        """
+        if os.path.exists(f"{ROOT_DIR}/{key}"):
+            return pg.image.load(f"{ROOT_DIR}/{key}").convert()
+
+        # A mapper avatar from github; show an empty one until the fetcher has it again
+        song_ref = self.song_cache[key.split("/")[1]]
+        self.avatars.request(song_ref.mapper, key)
+        return pg.image.load(f"{ROOT_DIR}/assets/empty_avatar.jpg").convert()
+
     def load_cache(self) -> Tuple[int, int]:
         """
         Sequentially caches song data and essential images on a single thread
@@ -452,28 +649,13 @@ class App:
         if (next_item := len(self.song_cache)) < len(self.song_names):
             next_song = self.song_names[next_item]
             self.song_cache[next_song] = fetch_song_data(next_song)
+            self.load_songstate(self.song_cache[next_song])
 
             if self.song_cache[next_song].mapper_avatar == "!":
-                # Fetch it from github
-                try:
-                    url = f"https://github.com/{self.song_cache[next_song].mapper}.png?size=400"
-                    response = requests.get(url)
-
-                    if response.ok:
-                        # Mapper name is a github account
-                        self.image_cache[
-                            f"beatmaps/{self.song_cache[next_song].image_name}/images/mapper_avatar.jpg"
-                        ] = pg.image.load(BytesIO(response.content)).convert()
-                    else:
-                        # Mapper name isn't a real github account
-                        self.image_cache[
-                            f"beatmaps/{self.song_cache[next_song].image_name}/images/mapper_avatar.jpg"
-                        ] = pg.image.load(f"{ROOT_DIR}/assets/empty_avatar.jpg").convert()
-                except requests.exceptions.ConnectionError:
-                    # Make it an empty avatar if the user has no wifi
-                    self.image_cache[
-                        f"beatmaps/{self.song_cache[next_song].image_name}/images/mapper_avatar.jpg"
-                    ] = pg.image.load(f"{ROOT_DIR}/assets/empty_avatar.jpg").convert()
+                # Fetch it from github in the background and show an empty avatar until it arrives
+                key = f"beatmaps/{self.song_cache[next_song].image_name}/images/mapper_avatar.jpg"
+                self.image_cache[key] = pg.image.load(f"{ROOT_DIR}/assets/empty_avatar.jpg").convert()
+                self.avatars.request(self.song_cache[next_song].mapper, key)
             else:
                 # An image has already been provided
                 self.image_cache[
@@ -482,14 +664,16 @@ class App:
                     f"{ROOT_DIR}/beatmaps/{self.song_cache[next_song].image_name}/images/mapper_avatar.jpg"
                 )
 
-        elif (next_item := len(self.image_cache)) < len(self.image_paths) + len(self.song_names):
-            next_image = self.image_paths[next_item - len(self.song_names)]
+        elif (next_item := self.images_loaded) < len(self.image_paths):
+            next_image = self.image_paths[next_item]
 
             img = pg.image.load(f"{ROOT_DIR}/{next_image}").convert()
 
             self.image_cache[next_image] = img
+            self.images_loaded += 1
 
-        curr_progress = len(self.song_cache) + len(self.image_cache)
+        # Counted separately from the image cache, as images may be evicted from it. Every song also has a mapper avatar
+        curr_progress = len(self.song_cache) * 2 + self.images_loaded
         total_progress = len(self.song_names) + len(self.image_paths) + len(self.song_names)
 
         return (curr_progress, total_progress)
@@ -518,8 +702,36 @@ class App:
 
         return (diamond, grade)
 
+    def close(self) -> None:
+        # Only ever runs once, whether it's called or left to atexit
+        atexit.unregister(self.close)
+
+        # Lets the State being shown stop whatever it started in enter()
+        if (current := getattr(self, "_state", None)) is not None:
+            current.exit()
+
+        self.preparer.close()
+        self.avatars.close()
+        self.writer.close()
+        self.scores.close()
+
+    def load_songstate(self, object: SongData) -> None:
+        """
+        Brings the diamonds and grades read from meta.toml up to date with the profile's score store
+        """
+        for difficulty, (diamond, grade) in self.scores.best(object.image_name).items():
+            diamond, grade = self.superior_diamond_grade(
+                getattr(object.diamond, difficulty), diamond, getattr(object.grade, difficulty), grade
+            )
+            setattr(object.diamond, difficulty, diamond)
+            setattr(object.grade, difficulty, grade)
+
     def save_songstate(
-        self, object: SongData, diamond: Literal["AP", "FC", "CL", "NA"], grade: Literal["C", "B", "A", "S"]
+        self,
+        object: SongData,
+        diamond: Literal["AP", "FC", "CL", "NA"],
+        grade: Literal["C", "B", "A", "S"],
+        result: Dict[str, int | str],
     ) -> None:
         assert self.conductor
 
@@ -541,33 +753,37 @@ class App:
                 object.diamond.master = diamond
                 object.grade.master = grade
 
-        save_song_data(object)
+        # meta.toml is only ever read; results go to the score store, off the main thread
+        song, difficulty = object.image_name, self.conductor.difficulty.name.lower()
+        played_at = time.time()
+
+        self.writer.submit(lambda: self.scores.add_play(song, difficulty, result, played_at))
+        # Only the latest best of a chart needs writing
+        self.writer.submit(
+            lambda: self.scores.set_best(song, difficulty, (diamond, grade)), key=("best", song, difficulty)
+        )
 
     def check_keys(self) -> None:
         # pass
 
         pressed_keys = pg.key.get_pressed()
 
-        self.lanes_state = [
-            pressed_keys[pg.K_a],
-            pressed_keys[pg.K_s],
-            pressed_keys[pg.K_d],
-            pressed_keys[pg.K_f],
-            pressed_keys[pg.K_j],
-            pressed_keys[pg.K_k],
-            pressed_keys[pg.K_l],
-            pressed_keys[pg.K_SEMICOLON],
-        ]
+        self.lanes_state = [pressed_keys[key] for key in LANE_KEYS]
 
     def check_events(self) -> None:
 
         for event in pg.event.get():
             if event.type == pg.QUIT:
+                self.close()
                 pg.quit()
                 sys.exit()
             if event.type == pg.KEYDOWN:
                 self.check_keys()
                 self.key_down = True
+
+                # Stamped as each press comes in, so a tap let go of within the same frame still counts
+                if type(self._state) is Calibrate and event.key in LANE_KEYS:
+                    self._state.tap(time.time())
             if event.type == pg.KEYUP:
                 self.check_keys()
 
@@ -575,8 +791,7 @@ class App:
             if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
                 if type(self._state) is Menu:
                     if self._state.hover_options:
-                        # Debug
-                        print("Options coming soon!")
+                        self._state.calibrate = True
                     if self._state.hover_play:
                         # Debug
                         print("PLAY")
@@ -602,9 +817,7 @@ class App:
                     elif self._state.hover_back:
                         self.mixer.play_sfx(self.sfx.back)
                         self._state.back = True
-                        self.mixer.unload()
-                        self.mixer.load(f"{ROOT_DIR}/audio/君の夜をくれ3.mp3")
-                        self.mixer.play()
+                        self.mixer.stream(f"{ROOT_DIR}/audio/君の夜をくれ3.mp3", loops=0)
                     elif self._state.hover_play and not self._state.play:
 
                         match self._state.difficulty:
@@ -634,8 +847,16 @@ class App:
 
                         self.mixer.play_sfx(self.sfx.play_game)
 
-                        # TODO: Add the background video and an option for that to be toggled
-                        # self.video = Video(self, self._state.song_ref.mv.frames_path, self._state.song_ref.image_name)
+                        if self.video:
+                            self.video.unload()
+                            self.video = None
+
+                        mv = self._state.song_ref.mv
+                        if Conf.MV_ENABLED and mv.available:
+                            if frames := open_frames(mv.frames_path, self._state.song_ref.image_name):
+                                self.video = (Conf.MV_DECODER == "processes" and SharedMemoryVideo or Video)(
+                                    self, frames
+                                )
 
                         self.mixer.unload()
                         self._state.play = True
@@ -646,6 +867,11 @@ class App:
 
         if type(self._state) is Menu and self._state.title.get_alpha() == 0:
             self.fader.fade_to_state(SongSelect)
+        elif type(self._state) is Menu and self._state.calibrate:
+            self.fader.fade_to_state(Calibrate)
+
+        if type(self._state) is Calibrate and self._state.done:
+            self.fader.fade_to_state(Menu)
 
         if type(self._state) is SongSelect and self._state.back:
             self.fader.fade_to_state(Menu)
@@ -656,21 +882,22 @@ class App:
             self.fader.fade_to_state(SongSelect)
 
     def run(self) -> None:
-        self.mixer.load(f"{ROOT_DIR}/audio/君の夜をくれ3.mp3")
-        self.mixer.play()
+        self.mixer.stream(f"{ROOT_DIR}/audio/君の夜をくれ3.mp3", loops=0)
 
         while 1:
             self.check_events()
+            self.load_avatars()
             self.manage_states()
             self.update()
             self.draw()
             self.fader.update()
 
-            self.cursor_rect = self.cursor.get_rect(center=pg.mouse.get_pos())
+            self.cursor_rect = self.cursor.get_rect(center=self.mouse_pos())
 
             if type(self._state) is not InGame and type(self._state) is not Loading:
                 self.Display.blit(self.cursor, self.cursor_rect)
 
+            self.present()
             pg.display.update()
 
             # Debugging lanes
@@ -684,4 +911,45 @@ class App:
             self.key_down = False
             # self.lanes_state = [False for _ in range(8)]
 
-            self.dt = self.Clock.tick(Conf.TARGET_FPS) * 0.001 * 60
+            self.dt = self.pacer.tick()
+
+            if Conf.SHOW_FRAME_STATS and len(self.pacer.times) == self.pacer.times.maxlen:
+                pg.display.set_caption(
+                    f"PyBeats {self.pacer.frame_rate:.0f}fps, ±{self.pacer.jitter:.2f}ms ({self.pacer.mode})"
+                )
+
+    def play_replay(self, replay: Replay, realtime: bool = True) -> Dict[str, int | str]:
+        """
+        Plays a replay straight through InGame, skipping the menus
+
+        Without realtime, nothing is drawn and frames run as fast as they can be judged. Returns the play's result
+        """
+        while (progress := self.load_cache())[0] < progress[1]:
+            pass
+
+        if (song := self.song_cache.get(replay.song)) is None:
+            raise ValueError(panic(f"{replay.song} isn't installed"))
+
+        notes: NoteData = getattr(song, f"map_{replay.difficulty.name.lower()}")
+        if chart_hash(notes, song.bpm_semiquaver) != replay.chart:
+            raise ValueError(
+                panic(f"The {replay.difficulty.name} chart of {replay.song} has changed since this replay")
+            )
+
+        self.replay = replay
+        self.conductor = Conductor(self, song.bpm_semiquaver, song.image_name, notes, replay.difficulty)
+        self.setState(InGame)
+
+        assert isinstance(self._state, InGame)
+        while not self._state.done:
+            if realtime:
+                self.check_events()
+            self.update()
+            if realtime:
+                self.draw()
+                self.present()
+                pg.display.update()
+                self.pacer.tick()
+
+        self.replay = None
+        return self._state.result
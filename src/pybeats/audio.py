@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict
+from enum import IntEnum
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy
+from pygame import mixer, sndarray
+
+from .conf import Conf
+
+if TYPE_CHECKING:
+    from .memory import MemoryBudget
+
+
+class MixerSetup:
+    """
+    What the mixer was opened with, and an estimate of how long after being played a sound is heard
+    """
+
+    def __init__(self, frequency: int, channels: int, buffer: int, latency: float) -> None:
+        self.frequency = frequency
+        self.channels = channels
+        self.buffer = buffer
+        # Seconds, estimated by estimate_latency()
+        self.latency = latency
+
+    def __str__(self) -> str:
+        return (
+            f"{self.frequency}Hz, {self.channels} channel(s), {self.buffer} sample buffer, "
+            f"~{self.latency * 1000:.1f}ms estimated output latency"
+        )
+
+
+def open_mixer(buffer: int) -> None:
+    """
+    (Re)opens the mixer with the given buffer and sets up its channels
+    """
+    mixer.quit()
+    mixer.init(Conf.SOUND_FREQUENCY, -16, Conf.SOUND_CHANNELS, buffer)
+
+    mixer.set_num_channels(Conf.MIXER_CHANNELS)
+    # Channel 0 is the lead pause, 1 loops music and the next Conf.HIT_VOICES are hit sounds.
+    # mixer.find_channel() must never hand those out
+    mixer.set_reserved(2 + Conf.HIT_VOICES)
+
+
+def estimate_latency(buffer: int, repeats: int = 3) -> Optional[float]:
+    """
+    An estimate of the output latency, from timing how long the mixer takes to play a short silence a few times.
+    Anything past the silence's own length is taken as time spent waiting on the audio device, plus the one buffer
+    the device is assumed to hold before it's heard. Nothing here hears the sound, so it can't see latency past the
+    driver, e.g. in the OS mixer or a Bluetooth link; calibration is what covers that
+
+    Returns the estimate in seconds, or None if the device fell behind, i.e. would underrun at this buffer
+    """
+    frequency, _, channels = mixer.get_init()
+    period = buffer / frequency
+
+    # A whole number of buffers, so the silence itself ends exactly on one
+    silence = mixer.Sound(buffer=bytes(2 * channels * buffer * max(4, round(0.05 / period))))
+    length = silence.get_length()
+
+    channel = mixer.Channel(0)
+    waits: List[float] = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        channel.play(silence)
+        while channel.get_busy():
+            time.sleep(0.0005)
+        waits.append(max(time.perf_counter() - start - length, 0.0))
+
+    # Waiting on the device for longer than that means it isn't being fed in time. The slack is for sleep()
+    if max(waits) > Conf.UNDERRUN_BUFFERS * period + 0.002:
+        return None
+
+    return sum(waits) / len(waits) + period
+
+
+def setup_mixer(profile: str = Conf.AUDIO_PROFILE) -> MixerSetup:
+    """
+    Opens the mixer for the given profile and estimates its latency
+
+    "default" uses Conf.SOUND_BUFFER_SIZE. "low_latency" tries Conf.LOW_LATENCY_BUFFERS smallest first and keeps the
+    first that the device keeps up with
+    """
+    candidates = profile == "low_latency" and list(Conf.LOW_LATENCY_BUFFERS) or []
+    candidates.append(Conf.SOUND_BUFFER_SIZE)
+
+    for buffer in candidates:
+        open_mixer(buffer)
+        if (latency := estimate_latency(buffer)) is not None:
+            break
+    else:
+        # Even the default falls behind; it's still the safest there is, but expect it to be heard late
+        latency = Conf.SOUND_BUFFER_SIZE / mixer.get_init()[0] * 3
+
+    frequency, _, channels = mixer.get_init()
+    return MixerSetup(frequency, channels, buffer, latency)
+
+
+def sound_size(sound: mixer.Sound) -> int:
+    """
+    Bytes of decoded PCM held by a Sound
+    """
+    return memoryview(sound).nbytes
+
+
+class SoundCache:
+    """
+    Bounded LRU of decoded sounds keyed by path
+
+    Each file is decoded once; after that playing it again never touches the disk. Sounds are also accounted for in
+    the game's MemoryBudget, which may evict them before this cache's own limit is reached
+    """
+
+    def __init__(self, max_bytes: int, budget: MemoryBudget) -> None:
+        self.max_bytes = max_bytes
+        self.budget = budget
+        self.size = 0
+
+        self.sounds: OrderedDict[str, mixer.Sound] = OrderedDict()
+        self.lock = Lock()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.sounds
+
+    def get(self, path: str) -> mixer.Sound:
+        with self.lock:
+            if (sound := self.sounds.get(path)) is not None:
+                self.sounds.move_to_end(path)
+                self.budget.touch("sounds", path)
+                return sound
+
+        # Decode outside the lock so a background prefetch never holds up the main thread
+        sound = mixer.Sound(path)
+
+        evicted: List[str] = []
+
+        with self.lock:
+            if path in self.sounds:
+                # Someone else decoded it in the meantime
+                self.sounds.move_to_end(path)
+                return self.sounds[path]
+
+            self.sounds[path] = sound
+            self.size += sound_size(sound)
+
+            # Never evict the sound that was just asked for, even if it alone is over budget.
+            # Channels keep their own reference, so evicting a sound that is playing is safe
+            while self.size > self.max_bytes and len(self.sounds) > 1:
+                evicted_path, evicted_sound = self.sounds.popitem(last=False)
+                self.size -= sound_size(evicted_sound)
+                evicted.append(evicted_path)
+
+        # The budget calls back into evict(), which takes this cache's lock
+        for evicted_path in evicted:
+            self.budget.untrack("sounds", evicted_path)
+        self.budget.track("sounds", path, sound_size(sound), evict=lambda: self.evict(path))
+
+        return sound
+
+    def evict(self, path: str) -> None:
+        with self.lock:
+            if (sound := self.sounds.pop(path, None)) is not None:
+                self.size -= sound_size(sound)
+
+
+class HoldSoundBank:
+    """
+    Hold sounds of one song, keyed by hold length in beats
+
+    Lengths without a holdbeats/hold_N.wav are synthesised once from the generic hold sound
+    """
+
+    def __init__(self, holdbeats_dir: str, base: mixer.Sound, sec_per_beat: float, budget: MemoryBudget) -> None:
+        self.holdbeats_dir = holdbeats_dir
+        self.base = base
+        self.sec_per_beat = sec_per_beat
+        self.budget = budget
+
+        self.sounds: Dict[int, mixer.Sound] = {}
+        # Pinned while its song is being played, as reloading one mid song is exactly what this bank is here to avoid
+        self.pinned = True
+
+    def __getitem__(self, length: int) -> mixer.Sound:
+        if (sound := self.sounds.get(length)) is None:
+            sound = self.load(length)
+            self.sounds[length] = sound
+            self.track(length)
+
+        return sound
+
+    def track(self, length: int) -> None:
+        self.budget.track(
+            "sounds",
+            f"{self.holdbeats_dir}/hold_{length}",
+            sound_size(self.sounds[length]),
+            evict=None if self.pinned else lambda: self.sounds.pop(length, None),
+        )
+
+    def pin(self) -> None:
+        self.pinned = True
+        for length in list(self.sounds):
+            self.track(length)
+
+    def release(self) -> None:
+        """
+        Lets the budget evict the sounds once the song is over. Evicted ones are loaded again by the next preload
+        """
+        self.pinned = False
+        for length in list(self.sounds):
+            self.track(length)
+
+    def preload(self, lengths: Iterable[int]) -> None:
+        for length in lengths:
+            self[length]
+
+    def load(self, length: int) -> mixer.Sound:
+        path = f"{self.holdbeats_dir}/hold_{length}.wav"
+
+        if os.path.exists(path):
+            return mixer.Sound(path)
+
+        return self.synthesise(length)
+
+    def synthesise(self, length: int) -> mixer.Sound:
+        freq = mixer.get_init()[0]
+        target = round(length * self.sec_per_beat * freq)
+
+        samples = sndarray.array(self.base)
+        # Loop the base sound if it's too short, then cut it down to size
+        reps = -(-target // len(samples))
+        buf = numpy.tile(samples, (reps,) + (1,) * (samples.ndim - 1))[:target]
+
+        # A 10ms fade out so the cut doesn't click
+        fade = min(len(buf), freq // 100)
+        ramp = numpy.linspace(1.0, 0.0, fade)
+        if buf.ndim > 1:
+            ramp = ramp[:, None]
+        buf[-fade:] = (buf[-fade:] * ramp).astype(buf.dtype)
+
+        return sndarray.make_sound(numpy.ascontiguousarray(buf))
+
+
+class ChordMixer:
+    """
+    Mixes the hit sounds of one judgement into a single Sound, so a chord takes one voice rather than one per note
+
+    Mixes are cached by the samples that went into them and how many of each
+    """
+
+    def __init__(self, samples: Dict[str, mixer.Sound], budget: MemoryBudget) -> None:
+        self.samples = samples
+        self.budget = budget
+
+        # Summed as int32 so stacking samples never wraps around before the gain brings it back down
+        self.arrays: Dict[str, numpy.ndarray] = {
+            name: sndarray.array(sound).astype(numpy.int32) for name, sound in samples.items()
+        }
+        self.mixes: Dict[Tuple[Tuple[str, int], ...], mixer.Sound] = {}
+
+    def __getitem__(self, key: Tuple[Tuple[str, int], ...]) -> mixer.Sound:
+        """
+        key is (sample name, count) pairs, sorted by name
+        """
+        if len(key) == 1 and key[0][1] == 1:
+            return self.samples[key[0][0]]
+
+        if (sound := self.mixes.get(key)) is None:
+            sound = self.mix(key)
+            self.mixes[key] = sound
+            # Pinned; there are only ever a handful and each is a few KB
+            self.budget.track("sfx", f"chord {key}", sound_size(sound))
+
+        return sound
+
+    def mix(self, key: Tuple[Tuple[str, int], ...]) -> mixer.Sound:
+        length = max(len(self.arrays[name]) for name, _ in key)
+        shape = (length,) + self.arrays[key[0][0]].shape[1:]
+        buf = numpy.zeros(shape, numpy.int32)
+
+        for name, count in key:
+            array = self.arrays[name]
+            buf[: len(array)] += array * count
+
+        # n copies of a sample played in sync are n times as loud, and clip. Scale them back to sqrt(n), about as
+        # loud as n different sounds together, and further still if that would clip
+        total = sum(count for _, count in key)
+        peak = max(int(numpy.abs(buf).max()), 1)
+        buf = buf * min(total**0.5 / total, 32767 / peak)
+
+        return sndarray.make_sound(numpy.ascontiguousarray(buf.astype(numpy.int16)))
+
+    def precompute(self, counts: Iterable[int]) -> None:
+        """
+        Mixes chords of each sample on its own ahead of time, as those are by far the most common
+        """
+        for name in self.samples:
+            for count in counts:
+                self[((name, count),)]
+
+
+class Priority(IntEnum):
+    Tap = 0
+    Crit = 1
+    Hold = 2
+
+
+class VoiceManager:
+    """
+    Hands out hit sound channels from a fixed pool
+
+    When every channel is busy the oldest voice of the lowest priority is stolen, so a new sound is only dropped
+    if the whole pool is playing something more important than it
+    """
+
+    def __init__(self, channel_ids: Iterable[int]) -> None:
+        self.channels: List[mixer.Channel] = [mixer.Channel(i) for i in channel_ids]
+        self.priorities: List[Priority] = [Priority.Tap for _ in self.channels]
+        # When each channel was last given a voice, counted in voices rather than time
+        self.started: List[int] = [0 for _ in self.channels]
+
+        # Lane id => the channel and sound of the hold playing on it
+        self.holds: Dict[int, Tuple[mixer.Channel, mixer.Sound]] = {}
+
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def allocate(self, priority: Priority) -> Optional[int]:
+        for idx, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return idx
+
+        victim: Optional[int] = None
+        for idx in range(len(self.channels)):
+            if self.priorities[idx] > priority:
+                continue
+            if victim is None or (self.priorities[idx], self.started[idx]) < (
+                self.priorities[victim],
+                self.started[victim],
+            ):
+                victim = idx
+
+        if victim is not None:
+            self.stolen += 1
+
+        return victim
+
+    def play(self, sound: mixer.Sound, priority: Priority) -> Optional[mixer.Channel]:
+        if (idx := self.allocate(priority)) is None:
+            self.dropped += 1
+            return None
+
+        self.played += 1
+        self.priorities[idx] = priority
+        self.started[idx] = self.played
+
+        self.channels[idx].play(sound)
+        return self.channels[idx]
+
+    def play_hold(self, lane: int, head: mixer.Sound, body: mixer.Sound) -> None:
+        # Only one hold can start on a lane at a time
+        self.stop_hold(lane)
+
+        self.play(head, Priority.Hold)
+        if channel := self.play(body, Priority.Hold):
+            self.holds[lane] = (channel, body)
+
+    def stop_hold(self, lane: int) -> None:
+        if (hold := self.holds.pop(lane, None)) is None:
+            return
+
+        channel, body = hold
+        # The channel may have finished the hold and moved on to another voice since
+        if channel.get_sound() is body:
+            channel.stop()
+
+    def stop(self) -> None:
+        for channel in self.channels:
+            channel.stop()
+        self.holds = {}
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import os
+import time
+from queue import Empty, Queue
+from threading import Thread
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+from .conf import Conf
+
+
+class AvatarFetcher:
+    """
+    Resolves mapper avatars on a background thread so the loading screen never waits on the network
+
+    Finished avatars are handed back as raw image bytes; turning them into Surfaces is left to the main thread
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        url: str = Conf.AVATAR_URL,
+        timeout: float = Conf.AVATAR_TIMEOUT,
+        expiry: float = Conf.AVATAR_CACHE_EXPIRY,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.url = url
+        self.timeout = timeout
+        self.expiry = expiry
+
+        self.jobs: Queue[Optional[Tuple[str, str]]] = Queue()
+        self.done: Queue[Tuple[str, bytes]] = Queue()
+
+        self.worker = Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def cache_path(self, mapper: str) -> str:
+        # Mapper names come straight from meta.toml; quoting every "/" keeps one like "../x" inside cache_dir
+        return f"{self.cache_dir}/{quote(mapper, safe='')}.png"
+
+    def request(self, mapper: str, key: str) -> None:
+        """
+        Queue up the avatar of a mapper; it will be returned by poll() under the given image cache key
+        """
+        self.jobs.put((mapper, key))
+
+    def poll(self) -> List[Tuple[str, bytes]]:
+        """
+        Returns every avatar that has finished resolving since the last call without blocking
+        """
+        finished: List[Tuple[str, bytes]] = []
+
+        while 1:
+            try:
+                finished.append(self.done.get_nowait())
+            except Empty:
+                return finished
+
+    def close(self) -> None:
+        self.jobs.put(None)
+
+    def read_cache(self, mapper: str, allow_stale: bool = False) -> Optional[bytes]:
+        path = self.cache_path(mapper)
+
+        if not os.path.exists(path):
+            return None
+
+        if not allow_stale and time.time() - os.path.getmtime(path) > self.expiry:
+            return None
+
+        with open(path, "rb") as f:
+            return f.read()
+
+    def write_cache(self, mapper: str, data: bytes) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Write to a temporary file first so a half written avatar is never picked up as a cache hit
+        tmp_path = f"{self.cache_path(mapper)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.cache_path(mapper))
+
+    def fetch(self, mapper: str) -> Optional[bytes]:
+        if (data := self.read_cache(mapper)) is not None:
+            return data
+
+        try:
+            response = requests.get(self.url.format(mapper=quote(mapper, safe="")), timeout=self.timeout)
+
+            if response.ok:
+                # Mapper name is a github account
+                self.write_cache(mapper, response.content)
+                return response.content
+        except requests.exceptions.RequestException:
+            # No wifi or the request timed out
+            pass
+
+        # An expired avatar is still better than an empty one
+        return self.read_cache(mapper, allow_stale=True)
+
+    def work(self) -> None:
+        while (job := self.jobs.get()) is not None:
+            mapper, key = job
+
+            if (data := self.fetch(mapper)) is not None:
+                self.done.put((key, data))
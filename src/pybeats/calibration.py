@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+from statistics import fmean, pstdev
+from typing import Dict, List, Tuple
+
+import pygame as pg
+import toml
+
+
+def device_name() -> str:
+    """
+    What offsets are kept per. They depend on both the audio output and the display, so it's made of the two
+    """
+    try:
+        from pygame._sdl2.audio import get_audio_device_names
+
+        audio = get_audio_device_names(False)[0]
+    except (ImportError, IndexError, pg.error):
+        audio = os.environ.get("SDL_AUDIODRIVER", "default")
+
+    try:
+        display = f"{pg.display.get_driver()} {'x'.join(map(str, pg.display.get_desktop_sizes()[0]))}"
+    except (IndexError, pg.error):
+        display = "default"
+
+    return f"{audio} / {display}"
+
+
+def measure(taps: List[float], beats: List[float], interval: float) -> Tuple[float, float]:
+    """
+    The mean and standard deviation of how far behind its nearest beat each tap was, in seconds
+
+    Taps more than half an interval from every beat were aimed at nothing and are left out
+    """
+    offsets: List[float] = []
+
+    for tap in taps:
+        offset = min((tap - beat for beat in beats), key=abs)
+        if abs(offset) < interval / 2:
+            offsets.append(offset)
+
+    if not offsets:
+        return (0.0, 0.0)
+
+    return (fmean(offsets), pstdev(offsets))
+
+
+class Calibration:
+    """
+    How far the player's ears and eyes run behind the game, in seconds, for each device they've calibrated on
+
+    audio covers the mixer, speakers and the player's reaction to what they hear; visual the display and the reaction
+    to what they see. Both include the keyboard, as neither can be measured without it
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.device = device_name()
+
+        try:
+            self.devices: Dict[str, Dict[str, float]] = toml.load(path)
+        except (OSError, toml.TomlDecodeError):
+            self.devices = {}
+
+    @property
+    def calibrated(self) -> bool:
+        return self.device in self.devices
+
+    def offsets(self, latency: float) -> Tuple[float, float]:
+        """
+        The audio and visual offsets of this device. Uncalibrated, audio is assumed to lag by the mixer's estimated
+        output latency
+        """
+        if (offsets := self.devices.get(self.device)) is None:
+            return (latency, 0.0)
+        return (offsets["audio"], offsets["visual"])
+
+    def set(self, audio: float, visual: float, audio_jitter: float, visual_jitter: float) -> None:
+        # Nothing finer than a tenth of a millisecond means anything here
+        self.devices[self.device] = {
+            "audio": round(audio, 4),
+            "visual": round(visual, 4),
+            "audio_jitter": round(audio_jitter, 4),
+            "visual_jitter": round(visual_jitter, 4),
+        }
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            toml.dump(self.devices, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import toml
+
+from .conf import Conf
+
+ROOT_DIR = Conf.ROOT_DIR
+
+DIFFICULTIES = ("easy", "normal", "hard", "master")
+NOTE_TYPES = ("t", "tc", "f", "fc", "h", "hr")
+LANES = 8
+
+# Compiled charts are meta.toml already parsed, as JSON, which loads many times faster
+COMPILED_DIR = Conf.CACHE_DIR / "charts"
+
+
+def compiled_path(song: str) -> str:
+    return f"{COMPILED_DIR}/{song}.json"
+
+
+def source_stamp(song: str) -> List[int]:
+    stat = os.stat(f"{ROOT_DIR}/beatmaps/{song}/meta.toml")
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def validate(song: str, meta: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """
+    Checks a parsed meta.toml for anything that would break or misbehave in game
+
+    Returns the errors, which stop the chart from compiling, and the warnings, which don't
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    for difficulty in DIFFICULTIES:
+        if (chart := meta.get(f"map_{difficulty}")) is None:
+            errors.append(f"{difficulty}: [map_{difficulty}] is missing")
+            continue
+
+        # The game treats a chart of a single note as one that hasn't been made yet
+        if len(chart) <= 1:
+            warnings.append(f"{difficulty}: no chart yet, only the placeholder note")
+
+        holds: Dict[int, str] = {}
+        releases: Dict[int, str] = {}
+        prev_beat: Optional[int] = None
+
+        for beat, notes in chart.items():
+            if not beat.isdigit():
+                errors.append(f"{difficulty}: beat {beat!r} isn't a whole number")
+                continue
+
+            # Notes are spawned in the order they're written
+            if prev_beat is not None and int(beat) <= prev_beat:
+                errors.append(f"{difficulty}: beat {beat} comes after beat {prev_beat}")
+            prev_beat = max(prev_beat or 0, int(beat))
+
+            for note in notes:
+                where = f"{difficulty}: beat {beat}"
+
+                if note.get("t") not in NOTE_TYPES:
+                    errors.append(f"{where}: unknown note type {note.get('t')!r}")
+                    continue
+
+                lane, width = note.get("l"), note.get("w")
+                if not isinstance(lane, int) or not isinstance(width, int):
+                    errors.append(f"{where}: lane {lane!r} and width {width!r} must both be whole numbers")
+                elif lane < 1 or width < 1 or lane + width - 1 > LANES:
+                    errors.append(f"{where}: lane {lane} with width {width} doesn't fit in {LANES} lanes")
+
+                match note["t"]:
+                    case "h":
+                        if not note.get("p"):
+                            errors.append(f"{where}: hold has no pair")
+                        elif note["p"] in holds:
+                            errors.append(
+                                f"{where}: pair {note['p']} is already used by the hold at {holds[note['p']]}"
+                            )
+                        else:
+                            holds[note["p"]] = where
+
+                        length = note.get("ln") or 1
+                        if not os.path.exists(f"{ROOT_DIR}/beatmaps/{song}/holdbeats/hold_{length}.wav"):
+                            warnings.append(f"{where}: no holdbeats/hold_{length}.wav, it will be synthesised")
+                    case "hr":
+                        if not note.get("p"):
+                            errors.append(f"{where}: release has no pair")
+                        elif note["p"] not in holds:
+                            errors.append(f"{where}: release of pair {note['p']} comes before any hold with it")
+                        elif note["p"] in releases:
+                            errors.append(f"{where}: pair {note['p']} is already released at {releases[note['p']]}")
+                        else:
+                            releases[note["p"]] = where
+
+        for pair, where in holds.items():
+            if pair not in releases:
+                errors.append(f"{where}: hold of pair {pair} is never released")
+
+    return (errors, warnings)
+
+
+def compile_song(song: str) -> Tuple[str, List[str], List[str]]:
+    """
+    Validates a song's meta.toml, writing its compiled chart if there were no errors
+
+    *Runs in a worker process
+    """
+    try:
+        meta = toml.load(f"{ROOT_DIR}/beatmaps/{song}/meta.toml")
+    except (OSError, toml.TomlDecodeError) as e:
+        return (song, [f"meta.toml can't be read: {e}"], [])
+
+    errors, warnings = validate(song, meta)
+
+    if not errors:
+        os.makedirs(COMPILED_DIR, exist_ok=True)
+
+        # Written next to the destination first so the game never reads a half written chart
+        tmp_path = f"{compiled_path(song)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"source": source_stamp(song), "meta": meta}, f, ensure_ascii=False)
+        os.replace(tmp_path, compiled_path(song))
+
+    return (song, errors, warnings)
+
+
+def compile_all(songs: List[str], processes: Optional[int] = None) -> List[Tuple[str, List[str], List[str]]]:
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(compile_song, songs))
+
+
+def load_compiled(song: str) -> Optional[Dict[str, Any]]:
+    """
+    The compiled chart of a song; None if it was never compiled or meta.toml has changed since
+    """
+    try:
+        with open(compiled_path(song)) as f:
+            compiled = json.load(f)
+
+        if compiled["source"] != source_stamp(song):
+            return None
+
+        return compiled["meta"]
+    # Anything that isn't a chart this version wrote is treated as not being there
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
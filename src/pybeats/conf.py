@@ -1,18 +1,70 @@
+import os
 from pathlib import Path
+from typing import Optional, Tuple
 from pygame import DOUBLEBUF
 
 
 class Conf:
     FLAGS = DOUBLEBUF
 
+    SOUND_FREQUENCY = 44100
+    SOUND_CHANNELS = 2
+    # Samples. Smaller buffers are heard sooner but need the device fed more often
     SOUND_BUFFER_SIZE = 1024
 
+    # "default" opens the mixer with SOUND_BUFFER_SIZE. "low_latency" uses the smallest of LOW_LATENCY_BUFFERS the
+    # audio device keeps up with, falling back to SOUND_BUFFER_SIZE
+    AUDIO_PROFILE = "default"
+    LOW_LATENCY_BUFFERS = (128, 256, 512)
+    # A buffer size is too small for the device if a test sound is kept waiting on it for more than this many buffers
+    UNDERRUN_BUFFERS = 2
+
+    # Bytes every cached image, sound and video frame together may take up before the least recently used are evicted
+    MEMORY_BUDGET = 768 * 1024 * 1024
+
+    # Bytes of decoded preview audio kept in memory. A minute of 44.1kHz 16-bit stereo is ~10MB
+    AUDIO_CACHE_SIZE = 64 * 1024 * 1024
+
     MIXER_CHANNELS = 32
 
+    # How many of the mixer channels are set aside for hit sounds. The rest go to the lead pause, looping music and UI
+    HIT_VOICES = 24
+
+    # "vsync" waits for the display, at whatever its refresh rate, falling back to "precise" where vsync isn't
+    # available. "precise" paces to TARGET_FPS. "uncapped" runs as fast as it can, no faster than MIN_FRAME_TIME
+    FRAME_PACING = "vsync"
     TARGET_FPS = 60
+    # No display refreshes faster than this. pygame can't tell what the display's own rate is, so vsynced frames that
+    # are shorter than this on average are taken to mean the driver is ignoring vsync
+    MAX_REFRESH_RATE = 360
+    # Seconds
+    MIN_FRAME_TIME = 1 / 1000
+    # Shows the frame rate and frame time jitter in the window's title
+    SHOW_FRAME_STATS = False
+
+    # "objects" moves and judges notes one NoteObject at a time, "numpy" keeps the note field in NumPy arrays and only
+    # judges the notes near the hit area
+    NOTE_ENGINE = "objects"
+
+    # Background MV shown behind the lanes in game
+    MV_ENABLED = True
+    MV_FPS = 30
+    # How far ahead of the song the MV decoder keeps frames ready. This is what bounds its memory use
+    MV_BUFFER_SECONDS = 3
+    # "threads" decodes on one background thread, "processes" on a process pool writing into shared memory
+    MV_DECODER = "threads"
+    # Roughly the number of physical cores
+    MV_DECODE_PROCESSES = max(1, (os.cpu_count() or 2) // 2)
 
-    # This is the best for a 2020 M1 MacBook Air 8GB
-    MAX_ALLOWED_THREADS = 30
+    # How many songs on each side of the selected one SongSelect keeps ready
+    PREFETCH_RADIUS = 2
+
+    # The resolution everything is drawn at before being scaled up to the window, so the cost of a frame doesn't grow
+    # with the window. None draws at the window's resolution
+    RENDER_RESOLUTION: Optional[Tuple[int, int]] = (960, 540)
+    # "scaled" => SDL's SCALED mode on the GPU, "smooth" => pygame.transform.smoothscale,
+    # "fast" => pygame.transform.scale
+    RENDER_SCALING = "scaled"
 
     # These are all 16:9 aspect ratio. Take it or leave it.
     SUPPORTED_RESOLUTIONS = [
@@ -26,6 +78,24 @@ class Conf:
 
     ROOT_DIR = Path(__file__).resolve().parents[2]
 
+    # Anything the game downloads or generates at runtime lives here
+    CACHE_DIR = ROOT_DIR / ".cache"
+
+    # Results are kept per profile, in PROFILE_DIR/{PROFILE}.db, and calibration offsets per audio output and display
+    # in PROFILE_DIR/{PROFILE}_calibration.toml. Beatmaps are never written to
+    PROFILE = "default"
+    PROFILE_DIR = ROOT_DIR / "profiles"
+
+    # Every finished play is saved here, and can be watched again with `python -m pybeats replay`
+    RECORD_REPLAYS = True
+    REPLAY_DIR = ROOT_DIR / "replays"
+
+    # Mapper avatars are fetched from github when a beatmap's mapper_avatar is "!"
+    AVATAR_URL = "https://github.com/{mapper}.png?size=400"
+    # Seconds
+    AVATAR_TIMEOUT = 5
+    AVATAR_CACHE_EXPIRY = 60 * 60 * 24 * 7
+
     KEYBINDS = {
         "lane0": "a",
         "lane1": "s",
@@ -46,6 +116,9 @@ class Conf:
         prod = "【作曲】"
         vocals = "【歌】"
         mapper = "【ビートマップ】"
+        calibrate_audio = "クリック音に合わせてレーンキーを押してください"
+        calibrate_visual = "バーが線に届く瞬間にレーンキーを押してください"
+        calibrate_done = "レーンキーを押して戻る"
 
     class EN:
         play = "Play"
@@ -54,5 +127,8 @@ class Conf:
         prod = "Music By: "
         vocals = "Vocals: "
         mapper = "Mapped By: "
+        calibrate_audio = "Tap any lane key along with the clicks"
+        calibrate_visual = "Tap any lane key as the bar reaches the line"
+        calibrate_done = "Press any lane key to go back"
 
     text = JP
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import colorama
 
+from .charts import load_compiled
 from .conf import Conf
 import toml
 from typing import Any, Dict, List, Type, Literal
@@ -40,9 +41,6 @@ def screen_res(meta) -> tuple[int, int]:
     h, w = meta.current_h, meta.current_w
     target_res = None
 
-    # Proof of concept; comment the below line if you want your RAM stolen. Trust me, keep the res small as it is.
-    h, w = 541, 961
-
     for res in Conf.SUPPORTED_RESOLUTIONS:
         if w > res["width"] and h > res["height"]:
             target_res = (res["width"], res["height"])
@@ -159,7 +157,9 @@ class SongData:
 
 
 def fetch_song_data(song: str) -> SongData:
-    meta = toml.load(f"{Conf.ROOT_DIR}/beatmaps/{song}/meta.toml")
+    # Made by `python -m pybeats compile`; only used while it's up to date with meta.toml
+    if (meta := load_compiled(song)) is None:
+        meta = toml.load(f"{Conf.ROOT_DIR}/beatmaps/{song}/meta.toml")
     return SongData(meta)
 
 
@@ -180,55 +180,3 @@ def beatmap_to_dict(beatmap: NoteData) -> Dict[str, List[Dict[str, int | str]]]:
             )
 
     return d
-
-
-def save_song_data(data: SongData):
-    d = {
-        "name": data.name,
-        "name_en": data.name_en,
-        "image_name": data.image_name,
-        "prod": data.prod,
-        "prod_en": data.prod_en,
-        "song_path": data.song_path,
-        "lite_song_path": data.lite_song_path,
-        "lite_img": data.lite_img,
-        "questionable": data.questionable,
-        "bpm_crotchet": data.bpm_crotchet,
-        "bpm_semiquaver": data.bpm_semiquaver,
-        "bpm_semihemiquaver": data.bpm_semihemiquaver,
-        "vocals": data.vocals,
-        "vocals_en": data.vocals_en,
-        "vocals_avatar": data.vocals_avatar,
-        "mapper": data.mapper,
-        "mapper_avatar": data.mapper_avatar,
-        "mv": {
-            "available": data.mv.available,
-            "frames_path": data.mv.frames_path,
-        },
-        "difficulty": {
-            "easy": data.difficulty.easy,
-            "normal": data.difficulty.normal,
-            "hard": data.difficulty.hard,
-            "master": data.difficulty.master,
-        },
-        "diamond": {
-            "easy": data.diamond.easy,
-            "normal": data.diamond.normal,
-            "hard": data.diamond.hard,
-            "master": data.diamond.master,
-        },
-        "grade": {
-            "easy": data.grade.easy,
-            "normal": data.grade.normal,
-            "hard": data.grade.hard,
-            "master": data.grade.master,
-        },
-        "map_easy": beatmap_to_dict(data.map_easy),
-        "map_normal": beatmap_to_dict(data.map_normal),
-        "map_hard": beatmap_to_dict(data.map_hard),
-        "map_master": beatmap_to_dict(data.map_master),
-    }
-
-    # print(green(f"{Conf.ROOT_DIR}/beatmaps/{data.name}/meta.toml"))
-    with open(f"{Conf.ROOT_DIR}/beatmaps/{data.image_name}/meta.toml", "w") as f:
-        toml.dump(d, f)
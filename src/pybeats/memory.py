@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pygame.surface import Surface
+
+
+def surface_size(surface: Surface) -> int:
+    """
+    Bytes of pixel data held by a Surface
+    """
+    return surface.get_height() * surface.get_pitch()
+
+
+def surfaces_size(obj: object) -> int:
+    """
+    Bytes held by the Surfaces among obj's attributes, looking one level into lists and dicts
+    """
+    size = 0
+
+    for value in vars(obj).values():
+        if isinstance(value, dict):
+            value = list(value.values())
+        for item in isinstance(value, list) and value or [value]:
+            if isinstance(item, Surface):
+                size += surface_size(item)
+
+    return size
+
+
+class Allocation:
+    __slots__ = ("size", "priority", "evict")
+
+    def __init__(self, size: int, priority: int, evict: Optional[Callable[[], None]]) -> None:
+        self.size = size
+        self.priority = priority
+        # None => pinned; it counts towards the budget but is never evicted
+        self.evict = evict
+
+
+class MemoryBudget:
+    """
+    Keeps count of the bytes held by every cache in the game, grouped by category
+
+    When the total goes over budget, the least recently used allocations of the lowest priority are evicted by calling
+    the function their cache registered for them
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+
+        self.allocations: OrderedDict[Tuple[str, str], Allocation] = OrderedDict()
+        self.lock = Lock()
+
+    def track(
+        self,
+        category: str,
+        key: str,
+        size: int,
+        evict: Optional[Callable[[], None]] = None,
+        priority: int = 0,
+    ) -> None:
+        with self.lock:
+            if (old := self.allocations.pop((category, key), None)) is not None:
+                self.size -= old.size
+
+            self.allocations[(category, key)] = Allocation(size, priority, evict)
+            self.size += size
+
+        self.enforce()
+
+    def untrack(self, category: str, key: str) -> None:
+        with self.lock:
+            if (old := self.allocations.pop((category, key), None)) is not None:
+                self.size -= old.size
+
+    def touch(self, category: str, key: str) -> None:
+        with self.lock:
+            if (category, key) in self.allocations:
+                self.allocations.move_to_end((category, key))
+
+    def enforce(self) -> None:
+        victims: List[Callable[[], None]] = []
+
+        with self.lock:
+            if self.size <= self.max_bytes:
+                return
+
+            # Least recently used first within each priority, the dict being in LRU order already
+            candidates = sorted(
+                (alloc.priority, order, key)
+                for order, (key, alloc) in enumerate(self.allocations.items())
+                if alloc.evict is not None
+            )
+
+            for _, _, key in candidates:
+                if self.size <= self.max_bytes:
+                    break
+
+                alloc = self.allocations.pop(key)
+                self.size -= alloc.size
+                victims.append(alloc.evict)  # type: ignore
+
+        # Caches take their own locks when evicting, so call them outside of this one
+        for evict in victims:
+            evict()
+
+    def usage(self) -> Dict[str, int]:
+        """
+        Bytes held per category
+        """
+        usage: Dict[str, int] = {}
+
+        with self.lock:
+            for (category, _), alloc in self.allocations.items():
+                usage[category] = usage.get(category, 0) + alloc.size
+
+        return usage
+
+
+class ImageCache(Dict[str, Surface]):
+    """
+    App.image_cache, with every image accounted for in a MemoryBudget
+
+    Evicted images are loaded again by the given loader the next time they're asked for
+    """
+
+    def __init__(self, budget: MemoryBudget, loader: Callable[[str], Surface]) -> None:
+        super().__init__()
+        self.budget = budget
+        self.loader = loader
+
+    def __missing__(self, key: str) -> Surface:
+        image = self.loader(key)
+        self[key] = image
+        return image
+
+    def __getitem__(self, key: str) -> Surface:
+        image = super().__getitem__(key)
+        self.budget.touch("images", key)
+        return image
+
+    def __setitem__(self, key: str, image: Surface) -> None:
+        super().__setitem__(key, image)
+        # Reloading an image hitches more than re-preparing a song or re-decoding a preview, so they go last
+        self.budget.track("images", key, surface_size(image), evict=lambda: self.pop(key, None), priority=1)
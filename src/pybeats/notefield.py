@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy
+
+if TYPE_CHECKING:
+    from .states.ingame import NoteObject
+
+# How a note moves, as stored in NoteField.kind. A release note keeps following its hold even after it has been
+# turned into a tap by the hold dying
+TAP = 0
+HOLD = 1
+RELEASE = 2
+
+
+class NoteField:
+    """
+    The positions of every live note kept in NumPy arrays, indexed by a slot each NoteObject is given when spawned
+
+    Moving the field and finding the notes close enough to the hit area to be judged are done for all notes at once,
+    so only those few go through the per note Python in InGame
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.top = numpy.zeros(capacity, numpy.int32)
+        self.height = numpy.zeros(capacity, numpy.int32)
+        self.kind = numpy.zeros(capacity, numpy.int8)
+        self.pair = numpy.zeros(capacity, numpy.int32)
+        # The slot of the hold a release note sits on top of; -1 once there isn't one
+        self.lead = numpy.full(capacity, -1, numpy.int32)
+        # When each note was spawned, so notes are judged in the same order the object engine would
+        self.order = numpy.zeros(capacity, numpy.int64)
+        self.live = numpy.zeros(capacity, bool)
+
+        self.objects: List[Optional[NoteObject]] = [None for _ in range(capacity)]
+        self.free: List[int] = list(reversed(range(capacity)))
+
+        # Pair => slot of the live hold with that pair
+        self.holds: Dict[int, int] = {}
+        self.spawned = 0
+
+    def grow(self) -> None:
+        capacity = len(self.live)
+
+        self.top = numpy.concatenate((self.top, numpy.zeros(capacity, numpy.int32)))
+        self.height = numpy.concatenate((self.height, numpy.zeros(capacity, numpy.int32)))
+        self.kind = numpy.concatenate((self.kind, numpy.zeros(capacity, numpy.int8)))
+        self.pair = numpy.concatenate((self.pair, numpy.zeros(capacity, numpy.int32)))
+        self.lead = numpy.concatenate((self.lead, numpy.full(capacity, -1, numpy.int32)))
+        self.order = numpy.concatenate((self.order, numpy.zeros(capacity, numpy.int64)))
+        self.live = numpy.concatenate((self.live, numpy.zeros(capacity, bool)))
+
+        self.objects.extend(None for _ in range(capacity))
+        self.free.extend(reversed(range(capacity, capacity * 2)))
+
+    def add(self, note: NoteObject) -> None:
+        if not self.free:
+            self.grow()
+
+        slot = self.free.pop()
+        note.slot = slot
+
+        self.top[slot] = note.rect.top
+        self.height[slot] = note.rect.height
+        self.kind[slot] = note.type == "h" and HOLD or note.pair != 0 and RELEASE or TAP
+        self.pair[slot] = note.pair
+        self.order[slot] = self.spawned
+        self.live[slot] = True
+        self.objects[slot] = note
+
+        self.spawned += 1
+
+        self.lead[slot] = -1
+        if note.type == "h":
+            self.holds[note.pair] = slot
+        elif note.pair != 0:
+            self.lead[slot] = self.holds.get(note.pair, -1)
+
+    def remove(self, note: NoteObject) -> None:
+        slot = note.slot
+
+        self.live[slot] = False
+        self.objects[slot] = None
+
+        if self.holds.get(note.pair) == slot:
+            del self.holds[note.pair]
+        # The slot is about to be reused, so nothing can keep following it
+        self.lead[self.lead == slot] = -1
+
+        self.free.append(slot)
+
+    def advance(self, step: int, speed: int, hit_top: int) -> None:
+        """
+        Moves every note by one frame, following the same rules as InGame.move_note
+        """
+        live = self.live
+
+        # Taps about to pass the top of the hit area land exactly on it first
+        taps = live & (self.kind == TAP)
+        snap = taps & (self.top + speed > hit_top) & (self.top < hit_top)
+        self.top[taps] = numpy.where(snap[taps], hit_top, self.top[taps] + step)
+
+        self.top[live & (self.kind == HOLD)] += step
+
+        # Release notes are carried along by their hold, after it has moved. Once the hold is gone they stay put
+        releases = live & (self.kind == RELEASE) & (self.lead >= 0)
+        self.top[releases] = self.top[self.lead[releases]]
+
+    def near(self, reach: int, hit_top: int) -> List[NoteObject]:
+        """
+        Notes whose bottom is within reach of the top of the hit area or past it, in the order they were spawned
+        """
+        slots = numpy.flatnonzero(self.live & (self.top + self.height + reach >= hit_top))
+        slots = slots[numpy.argsort(self.order[slots])]
+
+        return [self.objects[slot] for slot in slots]  # type: ignore
+
+    def released(self, dead_pairs: List[int]) -> List[NoteObject]:
+        """
+        Release notes still of type hr whose hold is in dead_pairs
+        """
+        if not dead_pairs:
+            return []
+
+        slots = numpy.flatnonzero(self.live & (self.kind == RELEASE) & numpy.isin(self.pair, dead_pairs))
+        return [note for slot in slots if (note := self.objects[slot]) and note.type == "hr"]
+
+    def sync(self, note: NoteObject) -> NoteObject:
+        """
+        Copies a note's position back into its rect, for code that still reads the rect
+        """
+        note.rect.top = int(self.top[note.slot])
+        note.remdist = note.ctx.hit_area_rect.centery - note.rect.centery
+        return note
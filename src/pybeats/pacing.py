@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from itertools import islice
+from statistics import fmean, pstdev
+from typing import Deque
+
+import pygame as pg
+
+from .conf import Conf
+
+# How many frames apart vsync is checked on, each time over the frames since the last check
+VSYNC_CHECK_FRAMES = 120
+
+
+class FramePacer:
+    """
+    Waits out each frame and measures how long it really took, in seconds
+
+    "vsync" leaves the waiting to display.update(), which then blocks until the display's next refresh, whatever its
+    rate. "precise" waits for Conf.TARGET_FPS with Clock.tick_busy_loop, which spins rather than sleeps and so wakes up
+    on time. "uncapped" never waits unless a frame was shorter than Conf.MIN_FRAME_TIME
+    """
+
+    def __init__(self, mode: str, fps: int) -> None:
+        self.mode = mode
+        self.fps = fps
+
+        self.clock = pg.time.Clock()
+        self.last = time.perf_counter()
+        # Seconds each of the last couple of seconds' worth of frames took
+        self.times: Deque[float] = deque(maxlen=240)
+        self.since_check = 0
+
+    def tick(self) -> float:
+        """
+        Ends a frame, returning how long it was in seconds
+        """
+        match self.mode:
+            case "vsync":
+                # display.update() has already waited
+                pass
+            case "precise":
+                self.clock.tick_busy_loop(self.fps)
+            case _:
+                while time.perf_counter() - self.last < Conf.MIN_FRAME_TIME:
+                    pass
+
+        # Clock only counts whole milliseconds, which is a lot of a 144Hz frame
+        now = time.perf_counter()
+        dt, self.last = now - self.last, now
+
+        self.times.append(dt)
+        self.since_check += 1
+
+        # Some drivers accept vsync and then ignore it, which would leave frames running flat out. Checked again and
+        # again rather than once, as a stretch of slow frames, e.g. while loading, would hide it
+        if self.mode == "vsync" and self.since_check >= VSYNC_CHECK_FRAMES:
+            self.since_check = 0
+            if fmean(islice(self.times, len(self.times) - VSYNC_CHECK_FRAMES, None)) < 1 / Conf.MAX_REFRESH_RATE:
+                self.mode = "precise"
+
+        return dt
+
+    @property
+    def frame_rate(self) -> float:
+        return self.times and 1 / fmean(self.times) or 0.0
+
+    @property
+    def jitter(self) -> float:
+        """
+        Standard deviation of recent frame times, in milliseconds. With steady pacing this is close to 0
+        """
+        return len(self.times) > 1 and pstdev(self.times) * 1000 or 0.0
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from .lib import Difficulty, NoteData, beatmap_to_dict, panic
+
+REPLAY_MAGIC = b"PBRP"
+REPLAY_VERSION = 2
+
+# Every record is a varint of (ms since the previous record << 5) | code. Codes 0-15 are lane edges, (lane << 1) | down;
+# FRAME ends a frame and is followed by another varint, that frame's dt in microseconds
+FRAME = 16
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    """
+    Returns the value and the position just past it
+    """
+    value = shift = 0
+
+    while 1:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return (value, pos)
+        shift += 7
+
+
+def write_str(out: bytearray, value: str) -> None:
+    encoded = value.encode()
+    write_varint(out, len(encoded))
+    out.extend(encoded)
+
+
+def read_str(buf: bytes, pos: int) -> Tuple[str, int]:
+    length, pos = read_varint(buf, pos)
+    return (buf[pos : pos + length].decode(), pos + length)
+
+
+def chart_hash(note_data: NoteData, bpm: int) -> bytes:
+    """
+    Identifies a chart by its notes and tempo, so a replay is never played back against a chart that has changed
+    """
+    chart = json.dumps({"bpm": bpm, "notes": beatmap_to_dict(note_data)}, sort_keys=True)
+    return hashlib.sha256(chart.encode()).digest()
+
+
+class Replay:
+    """
+    Every lane press and release of a play, with the timing of every frame it was judged on
+    """
+
+    def __init__(self, song: str, difficulty: Difficulty, chart: bytes, settings: Dict[str, Any]) -> None:
+        self.song = song
+        self.difficulty = difficulty
+        self.chart = chart
+        # Whatever judgement depends on besides the input, e.g. the resolution notes move at
+        self.settings = settings
+
+        # (ms since the start of InGame, code, dt in microseconds for a FRAME)
+        self.records: List[Tuple[int, int, int]] = []
+        self.result: Dict[str, Any] = {}
+
+    def save(self, path: str) -> None:
+        out = bytearray(REPLAY_MAGIC)
+        out.append(REPLAY_VERSION)
+
+        write_str(out, self.song)
+        write_str(out, self.difficulty.name)
+        out.extend(self.chart)
+        write_str(out, json.dumps(self.settings))
+        write_str(out, json.dumps(self.result))
+
+        write_varint(out, len(self.records))
+        prev = 0
+        for time, code, dt in self.records:
+            write_varint(out, (time - prev) << 5 | code)
+            if code == FRAME:
+                write_varint(out, dt)
+            prev = time
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(out)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Replay:
+        with open(path, "rb") as f:
+            buf = f.read()
+
+        if buf[:4] != REPLAY_MAGIC:
+            raise ValueError(panic(f"{path} is not a replay"))
+        if buf[4] != REPLAY_VERSION:
+            raise ValueError(panic(f"{path} is a version {buf[4]} replay; only version {REPLAY_VERSION} can be read"))
+
+        pos = 5
+        song, pos = read_str(buf, pos)
+        difficulty, pos = read_str(buf, pos)
+        chart = buf[pos : pos + 32]
+        pos += 32
+        settings, pos = read_str(buf, pos)
+        result, pos = read_str(buf, pos)
+
+        replay = cls(song, Difficulty[difficulty], chart, json.loads(settings))
+        replay.result = json.loads(result)
+
+        count, pos = read_varint(buf, pos)
+        time = 0
+        for _ in range(count):
+            value, pos = read_varint(buf, pos)
+            time += value >> 5
+            code = value & 0x1F
+
+            dt = 0
+            if code == FRAME:
+                dt, pos = read_varint(buf, pos)
+
+            replay.records.append((time, code, dt))
+
+        return replay
+
+
+class ReplayRecorder:
+    def __init__(self, replay: Replay) -> None:
+        self.replay = replay
+        self.lanes: List[bool] = [False for _ in range(8)]
+        self.time = 0
+
+    def frame(self, time: int, lanes_state: List[bool], dt: float) -> float:
+        """
+        Records the lanes as they are at the start of a frame
+
+        Returns dt rounded to what's stored, which is what the frame should then use so playback matches it exactly
+        """
+        # Times are stored as deltas, which can't be negative should the wall clock be stepped back
+        time = self.time = max(time, self.time)
+
+        for lane, down in enumerate(lanes_state):
+            if down != self.lanes[lane]:
+                self.replay.records.append((time, lane << 1 | down, 0))
+        self.lanes = list(lanes_state)
+
+        stored = round(dt * 1_000_000)
+        self.replay.records.append((time, FRAME, stored))
+
+        return stored / 1_000_000
+
+
+class ReplayPlayer:
+    def __init__(self, replay: Replay) -> None:
+        self.replay = replay
+        self.lanes: List[bool] = [False for _ in range(8)]
+        self.next = 0
+
+    def frame(self) -> Optional[Tuple[int, List[bool], float]]:
+        """
+        The time, lanes and dt of the next recorded frame; None once the replay has run out
+        """
+        records = self.replay.records
+
+        while self.next < len(records):
+            time, code, dt = records[self.next]
+            self.next += 1
+
+            if code == FRAME:
+                return (time, list(self.lanes), dt / 1_000_000)
+
+            self.lanes[code >> 1] = bool(code & 1)
+
+        return None
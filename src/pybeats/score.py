@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from typing import Dict, Hashable, Literal, Tuple
+
+# Quarter points each judgement is worth towards accuracy, kept whole so the running total never drifts
+POINTS: Dict[str, int] = {"PERFECT": 4, "GREAT": 3, "EARLY": 2, "MISS": 0}
+
+# Lowest accuracy for each rank, best first. Anything below the last is a C
+RANKS: Tuple[Tuple[Literal["S", "A", "B"], float, Tuple[int, int, int]], ...] = (
+    ("S", 95.00, (150, 100, 180)),
+    ("A", 90.00, (150, 70, 120)),
+    ("B", 75.00, (70, 150, 120)),
+)
+
+
+class Score:
+    """
+    Running totals of a play, updated one judgement at a time
+
+    Judgements are keyed by the note they're for and only the first for each note counts, so however many frames a
+    note is seen on, total never passes the number of notes. dirty is set whenever something shown on the HUD changes,
+    and is for the HUD to clear once it has redrawn
+    """
+
+    def __init__(self, note_count: int) -> None:
+        self.note_count = note_count
+
+        # Note => its grade
+        self.grades: Dict[Hashable, str] = {}
+        self.counts: Dict[str, int] = {grade: 0 for grade in POINTS}
+        self.total = 0
+        self.points = 0
+        self.combo = 0
+
+        self.accuracy = 0.0
+        self.rank: Literal["C", "B", "A", "S"] = "C"
+        self.rank_color = (150, 150, 150)
+
+        self.dirty = True
+
+    @property
+    def finished(self) -> bool:
+        """
+        Whether every note of the chart has been judged
+        """
+        return len(self.grades) >= self.note_count
+
+    def judge(self, note: Hashable, grade: str) -> None:
+        if note in self.grades:
+            return
+
+        self.grades[note] = grade
+        self.counts[grade] += 1
+        self.total += 1
+        self.points += POINTS[grade]
+
+        if grade == "PERFECT" or grade == "GREAT":
+            self.combo += 1
+        else:
+            self.combo = 0
+
+        self.update()
+
+    def revoke(self, note: Hashable) -> None:
+        """
+        A hold let go of too early; its judgement is taken back and it counts as a miss instead
+        """
+        if (grade := self.grades.pop(note, None)) is not None:
+            self.counts[grade] -= 1
+            self.total -= 1
+            self.points -= POINTS[grade]
+
+        self.judge(note, "MISS")
+
+    def update(self) -> None:
+        self.accuracy = self.points / (self.total * POINTS["PERFECT"]) * 100
+
+        self.rank, self.rank_color = "C", (150, 150, 150)
+        for rank, threshold, colour in RANKS:
+            if self.accuracy >= threshold:
+                self.rank, self.rank_color = rank, colour
+                break
+
+        self.dirty = True
+
+    def diamond(self) -> Literal["AP", "FC", "CL", "NA"]:
+        if self.total == self.counts["PERFECT"]:
+            return "AP"
+        if self.total == self.counts["PERFECT"] + self.counts["GREAT"]:
+            return "FC"
+        if self.total == self.counts["MISS"]:
+            return "NA"
+        return "CL"
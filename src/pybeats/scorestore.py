@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from threading import Lock
+from typing import Any, Dict, Literal, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plays (
+    id INTEGER PRIMARY KEY,
+    song TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    diamond TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    perfect INTEGER NOT NULL,
+    great INTEGER NOT NULL,
+    early INTEGER NOT NULL,
+    miss INTEGER NOT NULL,
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plays_by_chart ON plays (song, difficulty);
+
+CREATE TABLE IF NOT EXISTS best (
+    song TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    diamond TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    PRIMARY KEY (song, difficulty)
+) WITHOUT ROWID;
+"""
+
+
+class ScoreStore:
+    """
+    Every play of one profile, and the best diamond and grade of each chart, kept in SQLite
+
+    Beatmaps are never written to. Each save is one small transaction, so a crash mid-save loses at most that play.
+    Saves are made from App.writer's thread, so the connection is shared behind a lock
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def best(self, song: str) -> Dict[str, Tuple[Literal["AP", "FC", "CL", "NA"], Literal["C", "B", "A", "S"]]]:
+        """
+        Difficulty => best diamond and grade, for the difficulties of a song that have been played
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT difficulty, diamond, grade FROM best WHERE song = ?", (song,)).fetchall()
+
+        return {difficulty: (diamond, grade) for difficulty, diamond, grade in rows}
+
+    def add_play(self, song: str, difficulty: str, result: Dict[str, Any], played_at: float) -> None:
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT INTO plays (song, difficulty, diamond, grade, perfect, great, early, miss, played_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    song,
+                    difficulty,
+                    result["diamond"],
+                    result["rank"],
+                    result["perfect"],
+                    result["great"],
+                    result["early"],
+                    result["miss"],
+                    played_at,
+                ),
+            )
+
+    def set_best(
+        self,
+        song: str,
+        difficulty: str,
+        best: Tuple[Literal["AP", "FC", "CL", "NA"], Literal["C", "B", "A", "S"]],
+    ) -> None:
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO best (song, difficulty, diamond, grade) VALUES (?, ?, ?, ?)",
+                (song, difficulty, *best),
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import time
+from math import floor
+from typing import TYPE_CHECKING, List, Literal, Tuple
+
+import pygame as pg
+from pygame import font
+from pygame.surface import Surface
+
+from ..calibration import measure
+from ..conf import Conf
+
+if TYPE_CHECKING:
+    from ..app import App
+
+from ..app import State
+
+ROOT_DIR = Conf.ROOT_DIR
+
+# Seconds between metronome beats
+INTERVAL = 0.5
+# Beats of each phase, the first LEAD_IN of which are only there to find the rhythm and aren't measured
+BEATS = 20
+LEAD_IN = 4
+
+
+class Calibrate(State):
+    """
+    The player taps along to a metronome they can only hear, then to one they can only see. How late their taps land
+    on each is how far behind the game their audio and display run
+    """
+
+    def __init__(self, ctx: App) -> None:
+        super().__init__(ctx)
+
+        # Nothing else may be heard while measuring audio
+        self.ctx.mixer.unload()
+
+        font_scale = 18
+        self.font = (
+            Conf.text == Conf.JP
+            and font.Font(f"{ROOT_DIR}/fonts/KozGoPro-Light.otf", self.ctx.SCREEN_HEIGHT // font_scale)
+            or font.Font(f"{ROOT_DIR}/fonts/Mylodon-Light.otf", self.ctx.SCREEN_HEIGHT // font_scale)
+        )
+
+        self.line_y = floor(self.ctx.SCREEN_HEIGHT * 0.75)
+        self.bar = Surface((self.ctx.SCREEN_WIDTH // 3, self.ctx.SCREEN_HEIGHT // 36))
+        self.bar.fill((141, 223, 246))
+        self.bar_rect = self.bar.get_rect(centerx=self.ctx.Display.get_rect().centerx)
+
+        self.phase: Literal["audio", "visual", "result"] = "audio"
+        self.results: List[Tuple[float, float]] = []
+
+        self.done = False
+
+        self.start_phase()
+
+    def start_phase(self) -> None:
+        # A beat of silence first, so the first tap isn't a reaction to the screen changing
+        self.start_time = time.time() + INTERVAL
+        self.beats: List[float] = []
+        self.taps: List[float] = []
+
+        match self.phase:
+            case "audio":
+                text = Conf.text.calibrate_audio
+            case "visual":
+                text = Conf.text.calibrate_visual
+            case _:
+                (audio, audio_jitter), (visual, visual_jitter) = self.results
+                text = (
+                    f"Audio {audio * 1000:+.0f}ms (±{audio_jitter * 1000:.0f})   "
+                    f"Visual {visual * 1000:+.0f}ms (±{visual_jitter * 1000:.0f})"
+                )
+
+        self.text = self.font.render(text, True, (255, 255, 255))
+        self.text_rect = self.text.get_rect(center=self.ctx.Display.get_rect().center)
+        self.text_rect.y = self.ctx.SCREEN_HEIGHT // 6
+
+        self.hint = self.font.render(self.phase == "result" and Conf.text.calibrate_done or "", True, (150, 150, 150))
+        self.hint_rect = self.hint.get_rect(center=self.ctx.Display.get_rect().center)
+
+        self.progress = self.font.render("", True, (150, 150, 150))
+
+    def finish_phase(self) -> None:
+        # Taps on the lead in beats are too far from any measured beat to count
+        self.results.append(measure(self.taps, self.beats[LEAD_IN:], INTERVAL))
+
+        if self.phase == "audio":
+            self.phase = "visual"
+        else:
+            self.phase = "result"
+
+            (audio, audio_jitter), (visual, visual_jitter) = self.results
+            self.ctx.calibration.set(audio, visual, audio_jitter, visual_jitter)
+            self.ctx.writer.submit(self.ctx.calibration.save, key="calibration")
+
+        self.start_phase()
+
+    def tap(self, when: float) -> None:
+        """
+        A lane key going down, at the time.time() it was seen
+
+        *Called by App.check_events for every KEYDOWN, rather than worked out from lanes_state in update, so taps are
+        timed as they come in and none are lost between frames
+        """
+        if self.phase == "result":
+            self.done = True
+        else:
+            self.taps.append(when)
+
+    def update(self) -> None:
+        now = time.time()
+
+        if self.phase == "result":
+            return
+
+        # Beats are timed from when they're actually played or drawn, not from when they were due
+        if now >= self.start_time + len(self.beats) * INTERVAL:
+            if len(self.beats) == BEATS:
+                self.finish_phase()
+                return
+
+            if self.phase == "audio":
+                self.ctx.mixer.play_sfx(self.ctx.sfx.tap_perfect, self.ctx.LeadPauseChannel)
+                self.beats.append(now)
+            else:
+                self.beats.append(self.start_time + len(self.beats) * INTERVAL)
+
+            self.progress = self.font.render(f"{len(self.beats)} / {BEATS}", True, (150, 150, 150))
+
+    def draw(self) -> None:
+        self.ctx.Display.fill((0, 0, 0))
+        self.ctx.Display.blit(self.text, self.text_rect)
+        self.ctx.Display.blit(self.hint, self.hint_rect)
+
+        if self.phase == "result":
+            return
+
+        self.ctx.Display.blit(self.progress, self.progress.get_rect(midbottom=self.ctx.Display.get_rect().midbottom))
+
+        if self.phase == "visual":
+            pg.draw.line(self.ctx.Display, (120, 120, 120), (0, self.line_y), (self.ctx.SCREEN_WIDTH, self.line_y), 3)
+
+            # Falls from the top, reaching the line exactly on each beat
+            fraction = ((time.time() - self.start_time) % INTERVAL) / INTERVAL
+            self.bar_rect.bottom = floor(self.line_y * fraction)
+            self.ctx.Display.blit(self.bar, self.bar_rect)
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import time
+from io import BytesIO
 from math import floor
-from typing import TYPE_CHECKING, List, Literal, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 import pygame as pg
 from pygame import font
@@ -12,6 +13,10 @@ from pygame.surface import Surface
 from pybeats.lib import Note
 
 from ..conf import Conf
+from ..memory import surface_size
+from ..notefield import NoteField
+from ..replay import Replay, ReplayPlayer, ReplayRecorder, chart_hash
+from ..score import Score
 
 if TYPE_CHECKING:
     from ..app import App
@@ -20,6 +25,11 @@ from ..app import State
 
 ROOT_DIR = Conf.ROOT_DIR
 
+# Alpha per second a lane fades back at once its key is let go
+LANE_FADE_SPEED = 300
+# Seconds a judgement stays up under the hit area
+GRADE_TIME = 0.25
+
 
 class Lane:
     def __init__(self, ctx: InGame, xpos: int, id: int) -> None:
@@ -28,6 +38,8 @@ class Lane:
         self.rect: Rect = Rect(xpos, 0, self.ctx.lane_width, self.ctx.ctx.SCREEN_HEIGHT)
         self.surface: Surface = Surface(self.rect.size)
         self.surface.fill((0, 0, 0))
+        # Kept apart from the surface's own alpha, which is whole numbers only and would round away a slow fade
+        self.alpha = 120.0
         self.surface.set_alpha(120)
 
         scale = self.ctx.ctx.SCREEN_HEIGHT // 35
@@ -37,17 +49,110 @@ class Lane:
         self.key_hint_rect.centerx = self.rect.centerx
         self.key_hint_rect.y = floor(self.ctx.ctx.SCREEN_HEIGHT * 34.4 / 40)
 
+    def set_alpha(self, alpha: float) -> None:
+        self.alpha = alpha
+        self.surface.set_alpha(floor(alpha))
+
     def draw(self) -> None:
         pg.draw.rect(self.surface, (130, 130, 130), (0, 0, self.rect.width, self.rect.height), 5)
         # self.surface.set_alpha(120)
         self.ctx.ctx.Display.blit(self.surface, self.rect)
 
 
-class NoteObject:
-    __slots__ = ["ctx", "surface", "rect", "remdist", "lane", "width", "type", "length", "pair", "down", "alive"]
+class NoteSprites:
+    """
+    Pre-rendered note surfaces, shared by every note that looks the same
+
+    Sprites are keyed by their look and size in pixels, and the size already depends on the resolution
+    """
 
-    def __init__(self, ctx: InGame, note: Note) -> None:
+    # Colour and alpha of each kind of note
+    looks: Dict[str, Tuple[Tuple[int, int, int], int]] = {
+        "t": ((177, 156, 217), 210),
+        "hr": ((48, 136, 50), 210),
+        "h": ((148, 236, 150), 210),
+        # A hold that has been missed or let go of
+        "h_dead": ((200, 200, 200), 100),
+    }
+
+    def __init__(self, ctx: App) -> None:
         self.ctx = ctx
+        self.sprites: Dict[Tuple[str, int, int], Surface] = {}
+        # Pinned while an InGame is drawing them, evictable in between songs
+        self.pinned = True
+
+    def get(self, look: str, width: int, height: int) -> Surface:
+        if (sprite := self.sprites.get((look, width, height))) is None:
+            colour, alpha = self.looks[look]
+            sprite = Surface((width, height))
+            sprite.fill(colour)
+            sprite.set_alpha(alpha)
+
+            self.sprites[(look, width, height)] = sprite
+            self.track((look, width, height))
+
+        return sprite
+
+    def track(self, key: Tuple[str, int, int]) -> None:
+        look, width, height = key
+        self.ctx.memory.track(
+            "sprites",
+            f"{look}_{width}x{height}",
+            surface_size(self.sprites[key]),
+            evict=None if self.pinned else lambda: self.sprites.pop(key, None),
+        )
+
+    def pin(self) -> None:
+        self.pinned = True
+        for key in list(self.sprites):
+            self.track(key)
+
+    def release(self) -> None:
+        self.pinned = False
+        for key in list(self.sprites):
+            self.track(key)
+
+
+class NoteGroup(List["NoteObject"]):
+    """
+    The notes of one beat. Entries are set to None as they're hit or missed; spawned keeps hold of them all so they
+    can go back to the pool once the whole group is gone
+    """
+
+    def __init__(self, notes: List[NoteObject]) -> None:
+        super().__init__(notes)
+        self.spawned = notes
+
+
+class NoteObject:
+    __slots__ = [
+        "ctx",
+        "surface",
+        "rect",
+        "remdist",
+        "lane",
+        "width",
+        "type",
+        "length",
+        "pair",
+        "down",
+        "alive",
+        "hit",
+        "group",
+        "slot",
+        "source",
+    ]
+
+    def __init__(self, ctx: InGame) -> None:
+        """
+        Notes are pooled by InGame; reset() is what turns one into a particular note
+        """
+        self.ctx = ctx
+        self.rect: Rect = Rect(0, 0, 0, 0)
+
+    def reset(self, note: Note) -> NoteObject:
+        # The chart's own Note, which unlike this object is never reused, so it's what judgements are keyed by
+        self.source = note
         self.lane = self.ctx.lanes[note.lane - 1]
         self.width = note.width
 
@@ -61,46 +166,58 @@ class NoteObject:
         self.pair = note.pair
         self.down = False
         self.alive = True
+        self.hit = False
+
+        width = self.lane.rect.width * self.width - self.ctx.lane_border_width * (2 + self.width - 1)
 
         if self.type == "h":
             assert self.ctx.ctx.conductor
-            self.surface: Surface = Surface(
-                (
-                    self.lane.rect.width * self.width - self.ctx.lane_border_width * (2 + self.width - 1),
-                    # Calculates the note's height
-                    (60 * self.ctx.relative_speed * self.ctx.ctx.conductor.sec_per_beat * note.length)
-                    # + self.ctx.note_height / 2,
-                )
+            # The body is tiled from a short sprite when drawn, so only the rect is as tall as the hold
+            self.surface: Surface = self.ctx.sprites.get("h", width, self.ctx.hold_tile_height)
+            self.rect.size = (
+                width,
+                # Calculates the note's height
+                floor(60 * self.ctx.relative_speed * self.ctx.ctx.conductor.sec_per_beat * note.length),
             )
-            self.surface.fill((148, 236, 150))
-            self.surface.set_alpha(210)
-            self.rect: Rect = self.surface.get_rect()
             self.rect.left = self.lane.rect.left + self.ctx.lane_border_width
             self.rect.bottom = self.ctx.note_height
         else:
-            self.surface: Surface = Surface(
-                (
-                    self.lane.rect.width * self.width - self.ctx.lane_border_width * (2 + self.width - 1),
-                    self.ctx.note_height,
-                )
-            )
-
-            self.surface.fill((177, 156, 217))
-            if self.type == "hr":
-                self.surface.fill((48, 136, 50))
-
-            self.surface.set_alpha(210)
-            self.rect: Rect = self.surface.get_rect()
+            self.surface: Surface = self.ctx.sprites.get(self.type == "hr" and "hr" or "t", width, self.ctx.note_height)
+            self.rect.size = self.surface.get_size()
             self.rect.left = self.lane.rect.left + self.ctx.lane_border_width
             self.rect.y = 0
 
             self.remdist: int = self.ctx.hit_area_rect.centery - self.rect.centery
 
+        return self
+
     def draw(self) -> None:
-        self.ctx.ctx.Display.blit(self.surface, self.rect)
+        rect = self.rect.move(0, self.ctx.visual_shift)
+
+        if self.type != "h":
+            self.ctx.ctx.Display.blit(self.surface, rect)
+            return
+
+        # Only the part of a hold that's on the playfield is drawn, however long the hold is
+        visible = rect.clip(self.ctx.playfield)
+        tile_height = self.surface.get_height()
+
+        self.ctx.ctx.Display.blits(
+            (self.surface, (visible.left, y), (0, 0, visible.width, min(tile_height, visible.bottom - y)))
+            for y in range(visible.top, visible.bottom, tile_height)
+        )
 
 
 class InGame(State):
+    @staticmethod
+    def prepare(ctx: App) -> Dict[str, Any]:
+        assert ctx.conductor
+        song = ctx.conductor.song
+
+        # Read up front so loading it for the mixer never waits on the disk
+        with open(f"{ROOT_DIR}/beatmaps/{song}/{song}.mp3", "rb") as f:
+            return {"music": BytesIO(f.read())}
+
     def __init__(self, ctx: App) -> None:
         super().__init__(ctx)
 
@@ -109,6 +226,7 @@ class InGame(State):
         self.bg.set_alpha(180)
 
         self.note_height = floor(self.ctx.SCREEN_HEIGHT * 120 / 1920)
+        self.hold_tile_height = self.note_height * 4
 
         self.lane_border_width = 5
         self.lane_width_raw = 140
@@ -138,6 +256,9 @@ class InGame(State):
         self.bottom_overlay_rect.centerx = self.hit_area_rect.centerx
         self.bottom_overlay_rect.y = self.hit_area_rect.bottom
 
+        # Notes are covered by the bottom overlay once they're past the hit area
+        self.playfield = Rect(0, 0, self.ctx.SCREEN_WIDTH, self.bottom_overlay_rect.top)
+
         self.ctx.mixer.play_sfx(self.ctx.sfx.lead_pause, self.ctx.LeadPauseChannel)
         self.finished_pause = False
         self.start_pause = time.time()
@@ -146,7 +267,7 @@ class InGame(State):
         self.song_over = False
 
         assert self.ctx.conductor
-        self.ctx.mixer.load(f"{ROOT_DIR}/beatmaps/{self.ctx.conductor.song}/{self.ctx.conductor.song}.mp3")
+        self.ctx.mixer.load(self.ctx.prepared["music"])
 
         self.travel_dist = self.hit_area_rect.centery - self.note_height // 2
         self.note_speed = 4
@@ -154,33 +275,66 @@ class InGame(State):
         # 457 is not a random number; it's the travel distance for a 960x540 window
         self.relative_speed = floor(self.travel_dist / (457 / self.new_note_speed))
         self.time_frames = self.travel_dist / self.relative_speed
-
-        self.notes: List[List[NoteObject]] = []
+        # relative_speed is pixels per 60th of a second. Whatever a frame's step is rounded down by is carried over to
+        # the next, so notes move at the same speed at any frame rate
+        self.distance = 0.0
+        self.step = 0
+        # Notes are drawn this many pixels further along than they're judged at, so they're seen to reach the hit area
+        # when a tap on them would be judged perfect
+        self.visual_shift = round(self.ctx.conductor.visual_offset * 60 * self.relative_speed)
+
+        self.notes: List[NoteGroup] = []
         self.next_note_beat: int = 0
 
+        # Notes of groups that are gone, ready to be reset() into new ones
+        self.pool: List[NoteObject] = []
+
+        if self.ctx.note_sprites is None:
+            self.ctx.note_sprites = NoteSprites(self.ctx)
+        self.sprites = self.ctx.note_sprites
+        self.sprites.pin()
+        # Kept for exit(), as ctx.conductor may already be the next song's by then
+        self.hold_sounds = self.ctx.conductor.hold_sounds
+
+        self.field = Conf.NOTE_ENGINE == "numpy" and NoteField() or None
+
         self.start_time = time.time()
         self.song_start_time = 0
+        # Milliseconds since start_time, as of the start of this frame. Everything timed in here reads this rather than
+        # the wall clock, so a replay sees exactly the same times
+        self.frame_time = 0
+
+        self.player: Optional[ReplayPlayer] = None
+        self.recorder: Optional[ReplayRecorder] = None
+
+        if self.ctx.replay:
+            self.player = ReplayPlayer(self.ctx.replay)
+        elif Conf.RECORD_REPLAYS:
+            conductor = self.ctx.conductor
+            self.recorder = ReplayRecorder(
+                Replay(
+                    conductor.song,
+                    conductor.difficulty,
+                    chart_hash(conductor.note_data, conductor.bpm),
+                    {
+                        "resolution": [self.ctx.SCREEN_WIDTH, self.ctx.SCREEN_HEIGHT],
+                        "note_engine": Conf.NOTE_ENGINE,
+                        "pacing": self.ctx.pacer.mode,
+                    },
+                )
+            )
 
         self.spawned_first_note = False
 
         self.dead_sliders: List[int] = []
 
-        self.combo = 0
-        self.c_perfect = 0
-        self.c_great = 0
-        self.c_early = 0
-        self.c_miss = 0
-
-        self.total = 0
-        self.accuracy = 0.0
-        self.rank: Literal["C", "B", "A", "S"] = "C"
-        self.rank_color = (150, 150, 150)
+        self.score = Score(self.ctx.conductor.note_count)
 
         self.accuracy_font_scale = 15
         self.accuracy_font = font.Font(
             f"{ROOT_DIR}/fonts/Mylodon-Light.otf", self.ctx.SCREEN_HEIGHT // self.accuracy_font_scale
         )
-        self.accuracy_text = self.accuracy_font.render(f"{self.accuracy:0.2f}%", True, (255, 255, 255))
+        self.accuracy_text = self.accuracy_font.render(f"{self.score.accuracy:0.2f}%", True, (255, 255, 255))
         self.accuracy_text_rect = self.accuracy_text.get_rect()
         self.accuracy_text_rect.topright = self.ctx.Display.get_rect().topright
 
@@ -189,7 +343,7 @@ class InGame(State):
         )
         self.rank_font.set_bold(True)
         self.rank_font.set_italic(True)
-        self.rank_text = self.rank_font.render(self.rank, True, self.rank_color)
+        self.rank_text = self.rank_font.render(self.score.rank, True, self.score.rank_color)
         self.rank_text_rect = self.rank_text.get_rect()
         self.rank_text_rect.topright = self.accuracy_text_rect.bottomright
         self.rank_text_rect.right -= self.rank_text_rect.width // 2
@@ -199,7 +353,7 @@ class InGame(State):
         self.combo_font = font.Font(
             f"{ROOT_DIR}/fonts/Mylodon-Light.otf", self.ctx.SCREEN_HEIGHT // self.combo_font_scale
         )
-        self.combo_text = self.combo_font.render(str(self.combo), True, (255, 255, 255))
+        self.combo_text = self.combo_font.render(str(self.score.combo), True, (255, 255, 255))
         self.combo_text_rect = self.combo_text.get_rect()
         self.combo_text_rect.centery = self.ctx.Display.get_rect().centery
         self.combo_text_rect.centerx = floor(
@@ -210,62 +364,116 @@ class InGame(State):
         self.grade_font = font.Font(
             f"{ROOT_DIR}/fonts/Mylodon-Light.otf", self.ctx.SCREEN_HEIGHT // self.grade_font_scale
         )
-        self.grade_text = self.grade_font.render("", True, (255, 255, 255))
+        # Judgements pop up often enough that their text is only rendered once
+        self.grade_texts: Dict[str, Surface] = {
+            "": self.grade_font.render("", True, (255, 255, 255)),
+            "PERFECT": self.grade_font.render("Perfect", True, (141, 223, 246)),
+            "GREAT": self.grade_font.render("Great", True, (219, 125, 175)),
+            "EARLY": self.grade_font.render("Early", True, (140, 247, 180)),
+            "MISS": self.grade_font.render("Miss", True, (120, 120, 120)),
+        }
+        self.grade_text = self.grade_texts[""]
         self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
 
         self.grade_delay = 0
         self.done = False
+        self.result: Dict[str, Any] = {}
 
-        self.already_hit: List[NoteObject] = []
+        # Start filling the MV's buffer during the lead pause
+        if self.ctx.video:
+            self.ctx.video.start()
 
-    def update_accuracy(self) -> None:
-        self.total = self.c_perfect + self.c_great + self.c_early + self.c_miss
-        sum = self.c_perfect + self.c_great * 0.75 + self.c_early * 0.5
+    def exit(self) -> None:
+        # Nothing is drawn or played from these until the next song, which pins them again
+        self.sprites.release()
+        self.hold_sounds.release()
 
-        if self.total == 0:
-            self.accuracy = 0.0
-        else:
-            self.accuracy = (sum / self.total) * 100
-
-        if self.accuracy >= 95.00:
-            self.rank = "S"
-            self.rank_color = (150, 100, 180)
-        elif self.accuracy >= 90.00:
-            self.rank = "A"
-            self.rank_color = (150, 70, 120)
-        elif self.accuracy >= 75.00:
-            self.rank = "B"
-            self.rank_color = (70, 150, 120)
+    def judge(self, note: NoteObject, grade: str, revoke: bool = False) -> None:
+        """
+        Scores a judgement of note and pops it up under the hit area. revoke is for a hold let go of too early
+        """
+        if revoke:
+            self.score.revoke(note.source)
         else:
-            self.rank = "C"
-            self.rank_color = (150, 150, 150)
+            self.score.judge(note.source, grade)
+
+        self.grade_text = self.grade_texts[grade]
+        self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
+        self.grade_delay = 0
+
+    def update_hud(self) -> None:
+        """
+        Re-renders the accuracy, rank and combo, only once something has been judged since they were last rendered
+        """
+        if not self.score.dirty:
+            return
+        self.score.dirty = False
 
-        self.rank_text = self.rank_font.render(self.rank, True, self.rank_color)
-        self.accuracy_text = self.accuracy_font.render(f"{self.accuracy:0.2f}%", True, (255, 255, 255))
+        self.rank_text = self.rank_font.render(self.score.rank, True, self.score.rank_color)
+        self.accuracy_text = self.accuracy_font.render(f"{self.score.accuracy:0.2f}%", True, (255, 255, 255))
         self.accuracy_text_rect = self.accuracy_text.get_rect()
         self.accuracy_text_rect.topright = self.ctx.Display.get_rect().topright
         self.accuracy_text_rect.right = self.rank_text_rect.right
 
+        self.combo_text = self.combo_font.render(str(self.score.combo), True, (255, 255, 255))
+        self.combo_text_rect = self.combo_text.get_rect()
+        self.combo_text_rect.centery = self.ctx.Display.get_rect().centery
+        self.combo_text_rect.centerx = floor(
+            self.ctx.SCREEN_WIDTH - (self.ctx.SCREEN_WIDTH - self.lanes[-1].rect.right) / 2
+        )
+
+    def now(self) -> float:
+        """
+        The time as of the start of this frame, in the same seconds as start_time
+        """
+        return self.start_time + self.frame_time / 1000
+
+    def spawn(self, notes: List[Note]) -> NoteGroup:
+        group: List[NoteObject] = []
+
+        for note in notes:
+            obj = self.pool and self.pool.pop() or NoteObject(self)
+            group.append(obj.reset(note))
+
+        spawned = NoteGroup(group)
+
+        for obj in group:
+            obj.group = spawned
+            if self.field:
+                self.field.add(obj)
+
+        return spawned
+
+    def remove_group(self, group: NoteGroup) -> None:
+        # By identity, as two groups that are all None compare equal
+        for idx, _group in enumerate(self.notes):
+            if _group is group:
+                del self.notes[idx]
+                self.pool.extend(group.spawned)
+
+                if self.field:
+                    for note in group.spawned:
+                        self.field.remove(note)
+                return
+
     def spawn_note(self) -> None:
         assert self.ctx.conductor
 
         if not self.spawned_first_note:
             self.spawned_first_note = True
-            self.song_start_time = time.time() - self.start_time
+            self.song_start_time = self.now() - self.start_time
             self.first_beat = int(self.ctx.conductor.next_note_beat)
             notes = self.ctx.conductor.note_data.notes[str(self.first_beat)]
-            notes_mapped: List[NoteObject] = [NoteObject(self, note) for note in notes]
-            self.notes.append(notes_mapped)
+            self.notes.append(self.spawn(notes))
             self.next_note_beat = int(self.ctx.conductor.next_note_beat)
 
-        # If it's time to spawn another note
-        # NOTE: The *2.1 is a future calibration setting
+        # If it's time to spawn another note. Every note spawns as long after the first as its beat is after the first
+        # beat; latency is made up for where the song starts and where notes are drawn, never here
         if (
-            time.time() - self.start_time + self.ctx.conductor.sec_per_beat * 2.1
+            self.now() - self.start_time + self.ctx.conductor.sec_per_beat * self.first_beat
         ) >= self.song_start_time + self.next_note_beat * self.ctx.conductor.sec_per_beat:
             notes = self.ctx.conductor.note_data.notes[str(self.next_note_beat)]
-            notes_mapped: List[NoteObject] = [NoteObject(self, note) for note in notes]
-            self.notes.append(notes_mapped)
+            self.notes.append(self.spawn(notes))
 
             # Reached the last note, stop spawning
             if self.next_note_beat == int(self.ctx.conductor.final_note_beat):
@@ -281,94 +489,39 @@ class InGame(State):
         * Time to spawn = Initial time + next beat-to-sec
         """
 
-    def check_key(self, group: List[NoteObject], expected: List[Tuple[int]], grade: str) -> None:
+    def check_key(self, group: NoteGroup, grade: str) -> None:
         key_state = self.ctx.lanes_state
 
-        pressed_notes: List[bool] = [False for _ in range(len(group))]
-
-        for idx, keys in enumerate(expected):
-            for key in keys:
-                if key_state[key]:
-                    pressed_notes[idx] = True
-
-        # print(pressed_notes)
-
         hit_sounds = []
 
-        for idx, b in enumerate(pressed_notes):
-            if b:
-                target = group[idx]
-
+        for idx, target in enumerate(group):
+            # A note is pressed if any of the lanes it covers is
+            if target and any(key_state[key] for key in range(target.lane.id, target.lane.id + target.width)):
                 if target.type == "h":
+                    # Judged as it goes down, not on every frame it's held
                     if target.alive and not target.down:
                         target.down = True
                         hit_sounds.append(target)
                         for lane in range(target.lane.id, target.lane.id + target.width):
-                            self.lanes[lane].surface.set_alpha(230)
-
-                    if grade == "PERFECT":
-                        self.combo += 1
-                        self.c_perfect += 1
-
-                        self.grade_text = self.grade_font.render("Perfect", True, (141, 223, 246))
-                        self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
-                        self.grade_delay = 0
-                    elif grade == "GREAT":
-                        self.combo += 1
-                        self.c_great += 1
-
-                        self.grade_text = self.grade_font.render("Great", True, (219, 125, 175))
-                        self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
-                        self.grade_delay = 0
-                    elif grade == "EARLY":
-                        self.combo = 0
-                        self.c_early += 1
-
-                        self.grade_text = self.grade_font.render("Early", True, (140, 247, 180))
-                        self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
-                        self.grade_delay = 0
+                            self.lanes[lane].set_alpha(230)
+
+                        self.judge(target, grade)
                 else:
 
                     hit_sounds.append(target)
                     for lane in range(target.lane.id, target.lane.id + target.width):
-                        self.lanes[lane].surface.set_alpha(230)
+                        self.lanes[lane].set_alpha(230)
 
                     # group[idx] = None  # type: ignore
                     # print(group[idx])
 
                     print(group[idx])
 
-                    if group[idx] is not None and group[idx] not in self.already_hit:
-                        if grade == "PERFECT":
-                            self.combo += 1
-                            self.c_perfect += 1
-
-                            self.grade_text = self.grade_font.render("Perfect", True, (141, 223, 246))
-                            self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
-                            self.grade_delay = 0
-                            # group[idx] = None  # type: ignore
-                            # print("Deleting")
-                        elif grade == "GREAT":
-                            self.combo += 1
-                            self.c_great += 1
-
-                            self.grade_text = self.grade_font.render("Great", True, (219, 125, 175))
-                            self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
-                            self.grade_delay = 0
-                            # group[idx] = None  # type: ignore
-                            # print("Deleting")
-                        elif grade == "EARLY":
-                            self.combo = 0
-                            self.c_early += 1
-
-                            self.grade_text = self.grade_font.render("Early", True, (140, 247, 180))
-                            self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
-                            self.grade_delay = 0
-                            group[idx] = None  # type: ignore
-                            # print("Deleting")
+                    if group[idx] is not None and not group[idx].hit:
+                        self.judge(target, grade)
 
                     # This here looks really dumb but it's to prevent double counting due a bug in pygame's event loop
-                    self.already_hit.append(group[idx])
+                    target.hit = True
                     group[idx] = None  # type: ignore
 
                 print(grade)
@@ -377,7 +530,189 @@ class InGame(State):
         self.ctx.conductor.play_hit_sounds(hit_sounds, grade)
 
         if all(note is None for note in group):
-            self.notes.remove(group)
+            self.remove_group(group)
+
+    def kill_release(self, note: NoteObject) -> None:
+        """
+        Turns a release note into a tap once its hold has died
+        """
+        if note.type == "hr" and note.pair in self.dead_sliders:
+            note.type = "t"
+            note.surface = self.sprites.get("t", *note.surface.get_size())
+
+    def move_note(self, note: NoteObject) -> None:
+        """
+        Every note moves by its own rule, chords included. A hold's top is a whole hold length above the taps it's
+        spawned with, so nothing in a group can just copy another note's position
+        """
+        ## Move notes ##
+        if note.type == "h":
+            note.rect.y += self.step
+        elif (pair := note.pair) != 0:
+            # Ensure the release note is properly aligned with the slider
+            for _group in self.notes:
+                for _note in _group:
+                    if _note:
+                        if _note.pair == pair:
+                            note.rect.top = _note.rect.top
+        else:
+            if note.rect.y + self.relative_speed > self.hit_area_rect.y and note.rect.top < self.hit_area_rect.top:
+                note.rect.y += self.hit_area_rect.y - note.rect.y
+            else:
+                note.rect.y += self.step
+
+    def grade_at(self, note: NoteObject) -> Optional[str]:
+        """
+        The grade a tap or release note would get if it were hit now, or None if it's outside the timing windows
+        """
+        top, bottom = note.rect.top, note.rect.bottom
+        hit = self.hit_area_rect
+
+        if (
+            (top < hit.top and top + 2 * self.relative_speed >= hit.top)
+            or (bottom > hit.bottom and bottom - 2 * self.relative_speed <= hit.bottom)
+            or note.rect.centery == hit.centery
+        ):
+            return "PERFECT"
+
+        if (top < hit.top and top + 4 * self.relative_speed >= hit.top) or (
+            bottom > hit.bottom and bottom - 4 * self.relative_speed <= hit.bottom
+        ):
+            return "GREAT"
+
+        if top < hit.top and top + 6 * self.relative_speed >= hit.top:
+            return "EARLY"
+
+        return None
+
+    def judge_note(self, group: NoteGroup, note: NoteObject) -> None:
+        ## Check presses and evaluate a score ##
+
+        if note.type != "h" and note.type != "hr" and note in group:
+            if grade := self.grade_at(note):
+                self.check_key(group, grade)
+
+        elif note.type == "h":
+            # else:
+            if note.alive and not note.down:
+                # Detect the initial hit on the slider head
+                if (
+                    (
+                        note.rect.bottom - self.note_height < self.hit_area_rect.top
+                        and note.rect.bottom - self.note_height + 2 * self.relative_speed
+                        >= self.hit_area_rect.top
+                    )
+                    or (
+                        note.rect.bottom > self.hit_area_rect.bottom
+                        and note.rect.bottom - 2 * self.relative_speed <= self.hit_area_rect.bottom
+                    )
+                    or (note.rect.bottom - (note.rect.bottom - self.note_height) // 2)
+                    == self.hit_area_rect.centery
+                ):
+                    # Perfect
+                    self.check_key(group, "PERFECT")
+                elif (
+                    note.rect.bottom - self.note_height < self.hit_area_rect.top
+                    and note.rect.bottom - self.note_height + 4 * self.relative_speed
+                    >= self.hit_area_rect.top
+                ) or (
+                    note.rect.bottom > self.hit_area_rect.bottom
+                    and note.rect.bottom - 4 * self.relative_speed <= self.hit_area_rect.bottom
+                ):
+                    # Great
+                    self.check_key(group, "GREAT")
+                elif (
+                    note.rect.bottom - self.note_height < self.hit_area_rect.top
+                    and note.rect.bottom - self.note_height + 6 * self.relative_speed
+                    > self.hit_area_rect.top
+                ):
+                    # Early
+                    self.check_key(group, "EARLY")
+                elif note.rect.bottom - self.note_height > self.hit_area_rect.bottom:
+                    self.judge(note, "MISS")
+                    print("MISS")
+                    note.alive = False
+                    note.surface = self.sprites.get("h_dead", *note.surface.get_size())
+                    self.dead_sliders.append(note.pair)
+
+            if (
+                note.down
+                and note.alive
+                and (note.rect.top + 6 * self.relative_speed < self.hit_area_rect.top)
+            ):
+                key_state = self.ctx.lanes_state
+
+                still_down = False
+
+                slider_lanes = list(range(note.lane.id, note.lane.id + note.width))
+                for key in slider_lanes:
+                    if key_state[key]:
+                        still_down = True
+
+                if not still_down:
+                    self.judge(note, "MISS", revoke=True)
+                    print("Slider MISS")
+                    self.ctx.voices.stop_hold(note.lane.id)
+                    note.alive = False
+                    note.surface = self.sprites.get("h_dead", *note.surface.get_size())
+                    self.dead_sliders.append(note.pair)
+
+        elif note.type == "hr":
+            if grade := self.grade_at(note):
+                # Judged as every lane under it is let go of
+                if not any(self.ctx.lanes_state[key] for key in range(note.lane.id, note.lane.id + note.width)):
+                    for lane in range(note.lane.id, note.lane.id + note.width):
+                        self.lanes[lane].set_alpha(200)
+
+                    self.ctx.conductor.play_hit_sounds([note], grade)
+
+                    for idx, _note in enumerate(group):
+                        if note == _note:
+                            group[idx] = None  # type: ignore
+                            self.judge(note, grade)
+
+                if all(note is None for note in group):
+                    self.remove_group(group)
+
+        # Should be for notes that are not of type h | hr
+        if note:
+            # if note.rect.top > self.hit_area_rect.bottom and note.type != "h":
+            if note.rect.top > self.hit_area_rect.bottom:
+                # Missed
+                if group in self.notes:
+                    for idx, _note in enumerate(group):
+                        if note == _note:
+                            group[idx] = None  # type: ignore
+
+                    if not note.type == "h" and note.alive:
+                        print("MISS")
+                        self.judge(note, "MISS")
+
+                if all(note is None for note in group):
+                    self.remove_group(group)
+
+    def update_field(self) -> None:
+        """
+        update() for the NumPy note field; the whole field is moved at once and only notes near the hit area are
+        judged one by one
+        """
+        assert self.field
+
+        for note in self.field.released(self.dead_sliders):
+            self.kill_release(note)
+
+        self.field.advance(self.step, self.relative_speed, self.hit_area_rect.top)
+
+        for note in self.field.near(6 * self.relative_speed, self.hit_area_rect.top):
+            group = note.group
+
+            # Already hit, missed or removed with its group earlier this frame
+            if not any(_note is note for _note in group):
+                continue
+
+            # Its hold may have died earlier this frame
+            self.kill_release(note)
+            self.judge_note(group, self.field.sync(note))
 
     def update(self) -> None:
         if self.done:
@@ -385,315 +720,48 @@ class InGame(State):
 
         assert self.ctx.conductor
 
+        if self.player:
+            if (frame := self.player.frame()) is None:
+                # Ran out before the song finished; nothing more can be judged
+                self.done = True
+                return
+            self.frame_time, self.ctx.lanes_state, self.ctx.dt = frame
+        else:
+            self.frame_time = round((time.time() - self.start_time) * 1000)
+            if self.recorder:
+                self.ctx.dt = self.recorder.frame(self.frame_time, self.ctx.lanes_state, self.ctx.dt)
+
+        self.distance += self.relative_speed * 60 * self.ctx.dt
+        self.step = floor(self.distance)
+        self.distance -= self.step
+
         # Waiting 5 seconds before the song starts, but of course note spawning will start just before 5 seconds
-        if 5 - (time.time() - self.start_time) <= (self.time_frames / 60) and not self.song_over:
+        if 5 - (self.now() - self.start_time) <= (self.time_frames / 60) and not self.song_over:
             self.spawn_note()
 
         for idx, b in enumerate(self.ctx.lanes_state):
-            if b and self.lanes[idx].surface.get_alpha() <= 120:  # type: ignore
-                self.lanes[idx].surface.set_alpha(230)
+            if b and self.lanes[idx].alpha <= 120:
+                self.lanes[idx].set_alpha(230)
             else:
-                if self.lanes[idx].surface.get_alpha() > 120:  # type: ignore
-                    self.lanes[idx].surface.set_alpha(self.lanes[idx].surface.get_alpha() - 5 * self.ctx.dt)  # type: ignore
-
-        for group in self.notes:
-            for note in group:
-                if note:
+                if self.lanes[idx].alpha > 120:
+                    self.lanes[idx].set_alpha(max(self.lanes[idx].alpha - LANE_FADE_SPEED * self.ctx.dt, 120))
 
-                    if note.type == "hr":
-                        if note.pair in self.dead_sliders:
-                            note.type = "t"
-                            note.surface.fill((177, 156, 217))
-
-                    ## Move notes ##
-                    if group[0] == None:
-                        group[0] = note
-
-                    if note == group[0]:
-                        if note.type == "h":
-                            note.rect.y += floor(self.relative_speed * self.ctx.dt)
-                        elif (pair := note.pair) != 0:
-                            # Ensure the release note is properly aligned with the slider
-                            for _group in self.notes:
-                                for _note in _group:
-                                    if _note:
-                                        if _note.pair == pair:
-                                            note.rect.top = _note.rect.top
-                        else:
-                            if (
-                                note.rect.y + self.relative_speed > self.hit_area_rect.y
-                                and note.rect.top < self.hit_area_rect.top
-                            ):
-                                note.rect.y += self.hit_area_rect.y - note.rect.y
-                            else:
-                                note.rect.y += floor(self.relative_speed * self.ctx.dt)
-                    else:
-                        note.rect.y = group[0].rect.y
-
-                    ## Check presses and evaluate a score ##
-
-                    expected_lanes: List[Tuple[int]] = []
-
-                    if group in self.notes:
-                        for obj in self.notes[0]:
-                            if obj:
-                                expected_lanes.append(tuple(x for x in range(obj.lane.id, obj.lane.id + obj.width)))
-
-                    if note.type != "h" and note.type != "hr" and note in group:
-                        # if note.type != "h":
-                        if (
-                            (
-                                note.rect.top < self.hit_area_rect.top
-                                and note.rect.top + 2 * self.relative_speed >= self.hit_area_rect.top
-                            )
-                            or (
-                                note.rect.bottom > self.hit_area_rect.bottom
-                                and note.rect.bottom - 2 * self.relative_speed <= self.hit_area_rect.bottom
-                            )
-                            or note.rect.centery == self.hit_area_rect.centery
-                        ):
-                            # Perfect
-                            self.check_key(group, expected_lanes, "PERFECT")
-
-                        elif (
-                            note.rect.top < self.hit_area_rect.top
-                            and note.rect.top + 4 * self.relative_speed >= self.hit_area_rect.top
-                        ) or (
-                            note.rect.bottom > self.hit_area_rect.bottom
-                            and note.rect.bottom - 4 * self.relative_speed <= self.hit_area_rect.bottom
-                        ):
-                            # Great
-                            self.check_key(group, expected_lanes, "GREAT")
-
-                        elif (
-                            note.rect.top < self.hit_area_rect.top
-                            and note.rect.top + 6 * self.relative_speed >= self.hit_area_rect.top
-                        ):
-                            # Early
-                            self.check_key(group, expected_lanes, "EARLY")
-
-                    elif note.type == "h":
-                        # else:
-                        if note.alive and not note.down:
-                            # Detect the initial hit on the slider head
-                            if (
-                                (
-                                    note.rect.bottom - self.note_height < self.hit_area_rect.top
-                                    and note.rect.bottom - self.note_height + 2 * self.relative_speed
-                                    >= self.hit_area_rect.top
-                                )
-                                or (
-                                    note.rect.bottom > self.hit_area_rect.bottom
-                                    and note.rect.bottom - 2 * self.relative_speed <= self.hit_area_rect.bottom
-                                )
-                                or (note.rect.bottom - (note.rect.bottom - self.note_height) // 2)
-                                == self.hit_area_rect.centery
-                            ):
-                                # Perfect
-                                self.check_key(group, expected_lanes, "PERFECT")
-                            elif (
-                                note.rect.bottom - self.note_height < self.hit_area_rect.top
-                                and note.rect.bottom - self.note_height + 4 * self.relative_speed
-                                >= self.hit_area_rect.top
-                            ) or (
-                                note.rect.bottom > self.hit_area_rect.bottom
-                                and note.rect.bottom - 4 * self.relative_speed <= self.hit_area_rect.bottom
-                            ):
-                                # Great
-                                self.check_key(group, expected_lanes, "GREAT")
-                            elif (
-                                note.rect.bottom - self.note_height < self.hit_area_rect.top
-                                and note.rect.bottom - self.note_height + 6 * self.relative_speed
-                                > self.hit_area_rect.top
-                            ):
-                                # Early
-                                self.check_key(group, expected_lanes, "EARLY")
-                            elif note.rect.bottom - self.note_height > self.hit_area_rect.bottom:
-                                self.combo = 0
-                                self.c_miss += 1
-
-                                self.grade_text = self.grade_font.render("Miss", True, (120, 120, 120))
-                                self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
-                                self.grade_delay = 0
-                                print("MISS")
-                                note.alive = False
-                                note.surface.fill((200, 200, 200))
-                                note.surface.set_alpha(100)
-                                self.dead_sliders.append(note.pair)
-
-                        if (
-                            note.down
-                            and note.alive
-                            and (note.rect.top + 6 * self.relative_speed < self.hit_area_rect.top)
-                        ):
-                            key_state = self.ctx.lanes_state
-
-                            still_down = False
-
-                            slider_lanes = list(range(note.lane.id, note.lane.id + note.width))
-                            for key in slider_lanes:
-                                if key_state[key]:
-                                    still_down = True
-
-                            if not still_down:
-                                self.combo = 0
-                                self.c_miss += 1
-
-                                if self.c_perfect > 0:
-                                    self.c_perfect -= 1
-                                elif self.c_great > 0:
-                                    self.c_great -= 1
-                                elif self.c_early > 0:
-                                    self.c_early -= 1
-
-                                self.grade_text = self.grade_font.render("Miss", True, (120, 120, 120))
-                                self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
-                                print("Slider MISS")
-                                note.alive = False
-                                note.surface.fill((200, 200, 200))
-                                note.surface.set_alpha(100)
-                                self.dead_sliders.append(note.pair)
-
-                    elif note.type == "hr":
-                        if (
-                            (
-                                note.rect.top < self.hit_area_rect.top
-                                and note.rect.top + 2 * self.relative_speed >= self.hit_area_rect.top
-                            )
-                            or (
-                                note.rect.bottom > self.hit_area_rect.bottom
-                                and note.rect.bottom - 2 * self.relative_speed <= self.hit_area_rect.bottom
-                            )
-                            or note.rect.centery == self.hit_area_rect.centery
-                        ):
-                            # PERFECT
-                            key_state = self.ctx.lanes_state
-
-                            release_lanes = list(range(note.lane.id, note.lane.id + note.width))
-
-                            released = True
-
-                            for key in release_lanes:
-                                if key_state[key]:
-                                    released = False
-
-                            if released:
-                                for lane in range(note.lane.id, note.lane.id + note.width):
-                                    self.lanes[lane].surface.set_alpha(200)
-
-                                self.ctx.conductor.play_hit_sounds([note], "PERFECT")
-                                # group[0] = None  # type: ignore
-
-                                for idx, _note in enumerate(group):
-                                    if note == _note:
-                                        group[idx] = None  # type: ignore
-                                        self.combo += 1
-                                        self.c_perfect += 1
-
-                                        self.grade_text = self.grade_font.render("Perfect", True, (141, 223, 246))
-                                        self.grade_text_rect = self.grade_text.get_rect(
-                                            center=self.bottom_overlay_rect.center
-                                        )
-
-                            if all(note is None for note in group):
-                                self.notes.remove(group)
-
-                        elif (
-                            note.rect.top < self.hit_area_rect.top
-                            and note.rect.top + 4 * self.relative_speed >= self.hit_area_rect.top
-                        ) or (
-                            note.rect.bottom > self.hit_area_rect.bottom
-                            and note.rect.bottom - 4 * self.relative_speed <= self.hit_area_rect.bottom
-                        ):
-                            # great
-                            key_state = self.ctx.lanes_state
-
-                            release_lanes = list(range(note.lane.id, note.lane.id + note.width))
-
-                            released = True
-
-                            for key in release_lanes:
-                                if key_state[key]:
-                                    released = False
-
-                            if released:
-                                for lane in range(note.lane.id, note.lane.id + note.width):
-                                    self.lanes[lane].surface.set_alpha(200)
-
-                                self.ctx.conductor.play_hit_sounds([note], "GREAT")
-                                # group[0] = None  # type: ignore
-
-                                for idx, _note in enumerate(group):
-                                    if note == _note:
-                                        group[idx] = None  # type: ignore
-                                        self.combo += 1
-                                        self.c_great += 1
-
-                                        self.grade_text = self.grade_font.render("Great", True, (219, 125, 175))
-                                        self.grade_text_rect = self.grade_text.get_rect(
-                                            center=self.bottom_overlay_rect.center
-                                        )
-
-                            if all(note is None for note in group):
-                                self.notes.remove(group)
-                        elif (
-                            note.rect.top < self.hit_area_rect.top
-                            and note.rect.top + 6 * self.relative_speed >= self.hit_area_rect.top
-                        ):
-                            # early
-                            key_state = self.ctx.lanes_state
-
-                            release_lanes = list(range(note.lane.id, note.lane.id + note.width))
-
-                            released = True
-
-                            for key in release_lanes:
-                                if key_state[key]:
-                                    released = False
-
-                            if released:
-                                for lane in range(note.lane.id, note.lane.id + note.width):
-                                    self.lanes[lane].surface.set_alpha(200)
-
-                                self.ctx.conductor.play_hit_sounds([note], "EARLY")
-                                # group[0] = None  # type: ignore
-
-                                for idx, _note in enumerate(group):
-                                    if note == _note:
-                                        group[idx] = None  # type: ignore
-                                        self.combo = 0
-                                        self.c_early += 1
-
-                                        self.grade_text = self.grade_font.render("Early", True, (140, 247, 180))
-                                        self.grade_text_rect = self.grade_text.get_rect(
-                                            center=self.bottom_overlay_rect.center
-                                        )
+        if self.field:
+            self.update_field()
+        else:
+            # Everything moves before anything is judged, as in the NumPy engine. Otherwise a release note whose hold
+            # was judged and removed first is left behind
+            for group in self.notes:
+                for note in group:
+                    if note:
+                        self.move_note(note)
 
-                            if all(note is None for note in group):
-                                self.notes.remove(group)
-
-                    # Should be for notes that are not of type h | hr
+            # A copy, so removing a group partway through doesn't skip the one after it
+            for group in list(self.notes):
+                for note in group:
                     if note:
-                        # if note.rect.top > self.hit_area_rect.bottom and note.type != "h":
-                        if note.rect.top > self.hit_area_rect.bottom:
-                            # Missed
-                            if group in self.notes:
-                                for idx, _note in enumerate(group):
-                                    if note == _note:
-                                        group[idx] = None  # type: ignore
-
-                                if not note.type == "h" and note.alive:
-                                    print("MISS")
-                                    self.combo = 0
-                                    self.c_miss += 1
-
-                                    self.grade_text = self.grade_font.render("Miss", True, (120, 120, 120))
-                                    self.grade_text_rect = self.grade_text.get_rect(
-                                        center=self.bottom_overlay_rect.center
-                                    )
-
-                            if all(note is None for note in group):
-                                self.notes.remove(group)
+                        self.kill_release(note)
+                        self.judge_note(group, note)
 
                         # Might remove this field if it proves itself for future redundancy
                         note.remdist = self.hit_area_rect.centery - note.rect.centery
@@ -701,8 +769,15 @@ class InGame(State):
         if not self.playing:
             if not len(self.notes) > 0:
                 return
-            # If first note's remaining distance needs (first beat * bps) more time to reach the hit area
-            if self.notes[0][0].remdist / self.relative_speed / 60 <= self.ctx.conductor.sec_per_beat * self.first_beat:
+            first = next(note for note in self.notes[0] if note)
+            if self.field:
+                self.field.sync(first)
+            # If first note's remaining distance needs (first beat * bps) more time to reach the hit area, less however
+            # long the song takes to be heard
+            if (
+                first.remdist / self.relative_speed / 60
+                <= self.ctx.conductor.sec_per_beat * self.first_beat + self.ctx.conductor.audio_offset
+            ):
                 # self.ctx.mixer.toggle_pause()
                 self.ctx.mixer.play()
                 self.playing = True
@@ -710,35 +785,48 @@ class InGame(State):
         if self.playing:
             self.ctx.conductor.update()
 
-        self.update_accuracy()
+        self.update_hud()
 
-        self.combo_text = self.combo_font.render(str(self.combo), True, (255, 255, 255))
-        self.combo_text_rect = self.combo_text.get_rect()
-        self.combo_text_rect.centery = self.ctx.Display.get_rect().centery
-        self.combo_text_rect.centerx = floor(
-            self.ctx.SCREEN_WIDTH - (self.ctx.SCREEN_WIDTH - self.lanes[-1].rect.right) / 2
-        )
-
-        self.grade_delay += 1
-        if self.grade_delay == 15:
-            self.grade_text = self.grade_font.render("", True, (255, 255, 255))
+        self.grade_delay += self.ctx.dt
+        if self.grade_delay >= GRADE_TIME:
+            self.grade_text = self.grade_texts[""]
             self.grade_text_rect = self.grade_text.get_rect(center=self.bottom_overlay_rect.center)
             self.grade_delay = 0
 
-        if self.total == 90:
+        if self.score.finished:
             self.playing = False
             self.ctx.mixer.unload()
 
-            if self.total == self.c_perfect:
-                diamond = "AP"
-            elif self.total == self.c_perfect + self.c_great:
-                diamond = "FC"
-            elif self.total == self.c_miss:
-                diamond = "NA"
-            else:
-                diamond = "CL"
+            diamond = self.score.diamond()
+
+            if self.ctx.video:
+                self.ctx.video.unload()
+                self.ctx.video = None
+
+            self.result = {
+                "perfect": self.score.counts["PERFECT"],
+                "great": self.score.counts["GREAT"],
+                "early": self.score.counts["EARLY"],
+                "miss": self.score.counts["MISS"],
+                "diamond": diamond,
+                "rank": self.score.rank,
+            }
+
+            # Playing back a replay mustn't change the player's records
+            if not self.player:
+                self.ctx.save_songstate(
+                    self.ctx.song_cache[self.ctx.conductor.song], diamond, self.score.rank, self.result
+                )
+
+            if self.recorder:
+                replay = self.recorder.replay
+                replay.result = self.result
+                path = (
+                    f"{Conf.REPLAY_DIR}/{self.ctx.conductor.song}_{self.ctx.conductor.difficulty.name.lower()}_"
+                    f"{time.strftime('%Y%m%d-%H%M%S')}.pbr"
+                )
+                self.ctx.writer.submit(lambda: replay.save(path))
 
-            self.ctx.save_songstate(self.ctx.song_cache[self.ctx.conductor.song], diamond, self.rank)
             # For redirection
             self.ctx.target_map = self.ctx.conductor.song
             self.done = True
@@ -746,6 +834,10 @@ class InGame(State):
     def draw(self) -> None:
         self.ctx.Display.blit(self.bg, (0, 0))
 
+        if self.ctx.video and self.playing and self.ctx.conductor:
+            if frame := self.ctx.video.frame_at(self.ctx.conductor.pos):
+                self.ctx.Display.blit(frame, (0, 0))
+
         for lane in self.lanes:
             lane.draw()
 
@@ -755,6 +847,8 @@ class InGame(State):
         for group in self.notes:
             for note in group:
                 if note:
+                    if self.field:
+                        self.field.sync(note)
                     note.draw()
 
         self.ctx.Display.blit(self.bottom_overlay, self.bottom_overlay_rect)
@@ -16,6 +16,8 @@ from ..conf import Conf
 
 
 class Menu(State):
+    persistent = True
+
     def __init__(self, ctx: App) -> None:
         super().__init__(ctx)
 
@@ -27,7 +29,7 @@ class Menu(State):
         self.overlay.set_alpha(128)
         self.overlay.fill((0, 0, 0))
 
-        self.title: Surface = pg.image.load(f"{ROOT_DIR}/assets/Pybeats_text.jpg")
+        self.title: Surface = self.ctx.image_cache["assets/Pybeats_text.jpg"]
 
         scale = self.ctx.SCREEN_WIDTH * 0.8 / self.title.get_width()
 
@@ -35,9 +37,6 @@ class Menu(State):
             self.title, (self.title.get_width() * scale, self.title.get_height() * scale)
         ).convert_alpha()
 
-        self.title_rect = self.title.get_rect(center=self.ctx.Display.get_rect().center)
-        self.title_rect.y = self.ctx.SCREEN_HEIGHT // 6
-
         font_scale = 10
         self.font = (
             Conf.text == Conf.JP
@@ -45,6 +44,16 @@ class Menu(State):
             or font.Font(f"{ROOT_DIR}/fonts/Mylodon-Light.otf", self.ctx.SCREEN_HEIGHT // font_scale)
         )
 
+        # Pixels and alpha per second the title and buttons move up and fade out at once play is clicked
+        self.shift_speed = self.ctx.SCREEN_HEIGHT // 500 * 60
+        self.fade_speed = 8 * 60
+
+    def enter(self) -> None:
+        # Clicking play left the title faded out and everything moved up
+        self.title.set_alpha(255)
+        self.title_rect = self.title.get_rect(center=self.ctx.Display.get_rect().center)
+        self.title_rect.y = self.ctx.SCREEN_HEIGHT // 6
+
         self.play_text = self.font.render(Conf.text.play, True, (120, 120, 120))
         self.play_rect = self.play_text.get_rect(center=self.ctx.Display.get_rect().center)
         self.play_rect.y = self.ctx.SCREEN_HEIGHT // 6 * 3
@@ -55,30 +64,41 @@ class Menu(State):
 
         self.hover_play = False
         self.hover_options = False
+        # Settings is only the calibration screen for now
+        self.calibrate = False
 
         self.prev_hovering = False
         self.hovering = False
 
         self.switchf = False
-        self.shift_dist = self.ctx.SCREEN_HEIGHT // 500
-        self.fade_speed = 8
+        self.shift = 0.0
+        self.fade = 255.0
+
+        # SongSelect leaves its preview looping, turned down. Anything still streaming is the menu's own intro
+        self.ctx.mixer.loop_channel.stop()
+        self.ctx.mixer.set_volume(1.0)
+        if not self.ctx.mixer.busy():
+            self.ctx.mixer.stream(f"{ROOT_DIR}/audio/君の夜をくれ.mp3")
 
     def update(self) -> None:
-        # Background music for menu screen
-        if self.ctx.mixer.get_music_pos() == -1:
-            self.ctx.mixer.load(f"{ROOT_DIR}/audio/君の夜をくれ.mp3")
-            self.ctx.mixer.play()
+        # Background music for menu screen, looped once the intro has finished
+        if not self.ctx.mixer.busy():
+            self.ctx.mixer.stream(f"{ROOT_DIR}/audio/君の夜をくれ.mp3")
 
         if self.switchf:
-            self.title_rect.y -= floor(self.shift_dist * self.ctx.dt)
-            self.play_rect.y -= floor(self.shift_dist * self.ctx.dt)
-            self.options_rect.y -= floor(self.shift_dist * self.ctx.dt)
-
-            self.title.set_alpha(self.title.get_alpha() - self.fade_speed * self.ctx.dt)  # type: ignore
-            self.play_text.set_alpha(self.play_text.get_alpha() - self.fade_speed * self.ctx.dt)  # type: ignore
-            self.options_text.set_alpha(self.options_text.get_alpha() - self.fade_speed * self.ctx.dt)  # type: ignore
+            # Kept as floats so a high refresh rate's smaller steps aren't rounded away
+            step = floor(self.shift + self.shift_speed * self.ctx.dt) - floor(self.shift)
+            self.shift += self.shift_speed * self.ctx.dt
+            self.title_rect.y -= step
+            self.play_rect.y -= step
+            self.options_rect.y -= step
+
+            self.fade = max(self.fade - self.fade_speed * self.ctx.dt, 0)
+            self.title.set_alpha(floor(self.fade))
+            self.play_text.set_alpha(floor(self.fade))
+            self.options_text.set_alpha(floor(self.fade))
         else:
-            cursor = pg.mouse.get_pos()
+            cursor = self.ctx.mouse_pos()
 
             match cursor:
                 case (
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import random
 from math import floor
-from typing import TYPE_CHECKING, Literal, Optional, Tuple
+from queue import Queue
+from threading import Thread
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple
 
 import pygame as pg
 from pygame import BLEND_RGBA_MIN, SRCALPHA, font
@@ -10,7 +12,8 @@ from pygame.rect import Rect
 from pygame.surface import Surface
 
 from ..conf import Conf
-from ..lib import Difficulty
+from ..lib import Difficulty, SongData
+from ..memory import surface_size
 
 # from PIL import Image
 
@@ -22,17 +25,177 @@ from ..app import State
 
 ROOT_DIR = Conf.ROOT_DIR
 
+DIFFICULTIES = ("easy", "normal", "hard", "master")
+
+# Seconds the info pad takes to open or close
+INFO_ANIMATION_TIME = 1 / 3
+
+# Added to the thumbnail while hovering it, in the colour of the selected difficulty
+HOVER_TINTS = {
+    Difficulty.Easy: (0, 50, 30),
+    Difficulty.Normal: (0, 30, 50),
+    Difficulty.Hard: (50, 0, 30),
+    Difficulty.Master: (30, 0, 50),
+}
+
+
+class PreparedSong:
+    """
+    Everything SongSelect needs to show a song that doesn't depend on hover/animation state
+    """
+
+    __slots__ = ("lite_img", "song_text", "nums", "ranks", "tints")
+
+    def __init__(
+        self,
+        lite_img: Surface,
+        song_text: Surface,
+        nums: Dict[str, Surface],
+        ranks: Dict[str, Tuple[Surface, Rect, Surface, Rect]],
+    ) -> None:
+        self.lite_img = lite_img
+        self.song_text = song_text
+        self.nums = nums
+        self.ranks = ranks
+        # Hover tinted thumbnails, made the first time each is needed
+        self.tints: Dict[Difficulty, Surface] = {}
+
+    def tinted(self, difficulty: Difficulty) -> Surface:
+        if (tinted := self.tints.get(difficulty)) is None:
+            tinted = self.tints[difficulty] = self.lite_img.copy()
+            tinted.fill(HOVER_TINTS[difficulty], special_flags=pg.BLEND_ADD)
+
+        return tinted
+
+    @property
+    def size(self) -> int:
+        return (
+            surface_size(self.lite_img)
+            + sum(surface_size(tinted) for tinted in self.tints.values())
+            + surface_size(self.song_text)
+            + sum(surface_size(num) for num in self.nums.values())
+            + sum(surface_size(diamond) + surface_size(grade) for diamond, _, grade, _ in self.ranks.values())
+        )
+
+
+class SongPrefetcher:
+    """
+    Prepares the songs on either side of the one being shown, so switching to one never waits on it
+
+    Only decoding previews happens on the background worker. SDL isn't safe to call from two threads at once, so
+    rendering and scaling surfaces is left to step(), one song per frame on the main thread
+
+    Songs further than Conf.PREFETCH_RADIUS away from the cursor are evicted
+    """
+
+    def __init__(self, ctx: SongSelect) -> None:
+        self.ctx = ctx
+        self.radius = Conf.PREFETCH_RADIUS
+
+        self.prepared: Dict[str, PreparedSong] = {}
+        self.wanted: List[str] = []
+
+        # Bumped on every move so the worker skips previews that are no longer wanted
+        self.generation = 0
+        self.jobs: Queue[Optional[Tuple[int, str]]] = Queue()
+        self.worker: Optional[Thread] = None
+
+    def start(self) -> None:
+        # Each worker gets a queue of its own, so one still finishing a decode after close() can't take new jobs
+        self.jobs = Queue()
+        self.worker = Thread(target=self.work, args=(self.jobs,), daemon=True)
+        self.worker.start()
+
+    def get(self, song: str) -> PreparedSong:
+        """
+        Returns the prepared song, preparing it on the spot if step() hasn't got to it yet
+        """
+        if (prepared := self.prepared.get(song)) is None:
+            prepared = self.prepare(song)
+            self.store(song, prepared)
+
+        return prepared
+
+    def store(self, song: str, prepared: PreparedSong) -> None:
+        self.prepared[song] = prepared
+        self.ctx.ctx.memory.track("prepared", song, prepared.size, evict=lambda: self.evict(song))
+
+    def evict(self, song: str) -> None:
+        self.prepared.pop(song, None)
+        self.ctx.ctx.memory.untrack("prepared", song)
+
+    def around(self, idx: int) -> None:
+        song_names = self.ctx.ctx.song_names
+
+        self.wanted = []
+        # Closest first so the next switch in either direction is ready soonest
+        for dist in range(self.radius + 1):
+            for i in (idx + dist, idx - dist):
+                name = song_names[i % len(song_names)]
+                if name not in self.wanted:
+                    self.wanted.append(name)
+
+        for name in list(self.prepared):
+            if name not in self.wanted:
+                self.evict(name)
+
+        self.generation += 1
+        for name in self.wanted:
+            self.jobs.put((self.generation, f"{ROOT_DIR}/{self.ctx.ctx.song_cache[name].lite_song_path}"))
+
+    def step(self) -> None:
+        """
+        Prepares the closest wanted song that isn't yet
+
+        *Main thread only
+        """
+        for name in self.wanted:
+            if name not in self.prepared:
+                self.store(name, self.prepare(name))
+                return
+
+    def work(self, jobs: Queue[Optional[Tuple[int, str]]]) -> None:
+        while (job := jobs.get()) is not None:
+            generation, path = job
+
+            if generation == self.generation:
+                # Decoded previews live in the shared sound cache rather than here, so they count towards its budget
+                self.ctx.ctx.sounds.get(path)
+
+    def close(self) -> None:
+        # Anything still queued is no longer wanted
+        self.generation += 1
+        self.jobs.put(None)
+        self.worker = None
+
+    def prepare(self, song: str) -> PreparedSong:
+        song_ref = self.ctx.ctx.song_cache[song]
+
+        prod = Conf.text == Conf.JP and song_ref.prod or song_ref.prod_en
+        name = Conf.text == Conf.JP and song_ref.name or song_ref.name_en
+        song_text = self.ctx.font.render(f"【{prod}】{name}", True, (255, 255, 255))
+        song_text.set_alpha(200)
+
+        nums: Dict[str, Surface] = {}
+        ranks: Dict[str, Tuple[Surface, Rect, Surface, Rect]] = {}
+
+        for diff in DIFFICULTIES:
+            nums[diff] = self.ctx.num_font.render(str(getattr(song_ref.difficulty, diff)), True, (255, 255, 255))
+            ranks[diff] = self.ctx.load_diamond_and_rank(
+                getattr(song_ref.diamond, diff),
+                getattr(song_ref.grade, diff),
+                getattr(self.ctx, f"button_{diff}_rect"),
+            )
+
+        return PreparedSong(self.ctx.scale_lite_img(song_ref), song_text, nums, ranks)
+
 
 class SongSelect(State):
+    persistent = True
+
     def __init__(self, ctx: App) -> None:
         super().__init__(ctx)
 
-        if self.ctx.target_map:
-            self.song_ref = self.ctx.song_cache[self.ctx.target_map]
-        else:
-            self.song_idx = random.randint(0, len(self.ctx.song_cache) - 1)
-            self.song_ref = self.ctx.song_cache[self.ctx.song_names[self.song_idx]]
-
         self.bg: Surface = self.ctx.image_cache["assets/menu_tint.jpg"]
         self.bg = pg.transform.scale(self.bg, (self.ctx.SCREEN_WIDTH, self.ctx.SCREEN_HEIGHT)).convert_alpha()
         self.bg.set_alpha(180)
@@ -52,9 +215,6 @@ class SongSelect(State):
 
         self.frame.set_alpha(255)
 
-        self.lite_img = self.load_lite_img()
-        self.prev_img: Optional[Surface] = None
-
         self.rmap_button = self.ctx.image_cache["assets/switch_button_1_crop.jpg"]
         scale = self.ctx.SCREEN_WIDTH * 0.05 / self.rmap_button.get_width()
 
@@ -142,30 +302,18 @@ class SongSelect(State):
         self.easy_diff = self.diff_font.render("Easy", True, (255, 255, 255))
         self.easy_diff_rect = self.easy_diff.get_rect(center=self.button_easy_rect.center)
         self.easy_diff_rect.top = self.button_easy_rect.top + self.easy_diff_rect.height // 4
-        self.easy_num = self.num_font.render(str(self.song_ref.difficulty.easy), True, (255, 255, 255))
-        self.easy_num_rect = self.easy_num.get_rect(center=self.button_easy_rect.center)
-        self.easy_num_rect.centery = (self.button_easy_rect.bottom + self.easy_diff_rect.bottom) // 2
 
         self.normal_diff = self.diff_font.render("Normal", True, (255, 255, 255))
         self.normal_diff_rect = self.normal_diff.get_rect(center=self.button_normal_rect.center)
         self.normal_diff_rect.top = self.button_normal_rect.top + self.normal_diff_rect.height // 4
-        self.normal_num = self.num_font.render(str(self.song_ref.difficulty.normal), True, (255, 255, 255))
-        self.normal_num_rect = self.normal_num.get_rect(center=self.button_normal_rect.center)
-        self.normal_num_rect.centery = (self.button_normal_rect.bottom + self.normal_diff_rect.bottom) // 2
 
         self.hard_diff = self.diff_font.render("Hard", True, (255, 255, 255))
         self.hard_diff_rect = self.hard_diff.get_rect(center=self.button_hard_rect.center)
         self.hard_diff_rect.top = self.button_hard_rect.top + self.hard_diff_rect.height // 4
-        self.hard_num = self.num_font.render(str(self.song_ref.difficulty.hard), True, (255, 255, 255))
-        self.hard_num_rect = self.hard_num.get_rect(center=self.button_hard_rect.center)
-        self.hard_num_rect.centery = (self.button_hard_rect.bottom + self.hard_diff_rect.bottom) // 2
 
         self.master_diff = self.diff_font.render("Master", True, (255, 255, 255))
         self.master_diff_rect = self.master_diff.get_rect(center=self.button_master_rect.center)
         self.master_diff_rect.top = self.button_master_rect.top + self.master_diff_rect.height // 4
-        self.master_num = self.num_font.render(str(self.song_ref.difficulty.master), True, (255, 255, 255))
-        self.master_num_rect = self.master_num.get_rect(center=self.button_master_rect.center)
-        self.master_num_rect.centery = (self.button_master_rect.bottom + self.master_diff_rect.bottom) // 2
 
         self.diff_arrow = self.ctx.image_cache["assets/diff_arrow.jpg"]
         da_scale = self.ctx.SCREEN_WIDTH / 24 / self.diff_arrow.get_width()
@@ -173,32 +321,8 @@ class SongSelect(State):
             self.diff_arrow, (self.diff_arrow.get_width() * da_scale, self.diff_arrow.get_height() * da_scale)
         ).convert_alpha()
         self.diff_arrow_rect = self.diff_arrow.get_rect()
-        self.diff_arrow_rect.centerx = self.normal_diff_rect.centerx
         self.diff_arrow_rect.y = self.easy_diff_rect.y - self.easy_diff_rect.height * 2
 
-        self.diamond_easy, self.diamond_easy_rect, self.grade_easy, self.grade_easy_rect = self.load_diamond_and_rank(
-            self.song_ref.diamond.easy, self.song_ref.grade.easy, self.button_easy_rect
-        )
-        (
-            self.diamond_normal,
-            self.diamond_normal_rect,
-            self.grade_normal,
-            self.grade_normal_rect,
-        ) = self.load_diamond_and_rank(
-            self.song_ref.diamond.normal, self.song_ref.grade.normal, self.button_normal_rect
-        )
-        self.diamond_hard, self.diamond_hard_rect, self.grade_hard, self.grade_hard_rect = self.load_diamond_and_rank(
-            self.song_ref.diamond.hard, self.song_ref.grade.hard, self.button_hard_rect
-        )
-        (
-            self.diamond_master,
-            self.diamond_master_rect,
-            self.grade_master,
-            self.grade_master_rect,
-        ) = self.load_diamond_and_rank(
-            self.song_ref.diamond.master, self.song_ref.grade.master, self.button_master_rect
-        )
-
         self.back_button = self.ctx.image_cache["assets/back_icon.jpg"]
         scale = self.ctx.SCREEN_WIDTH * 0.05 / self.back_button.get_width()
         self.back_button = pg.transform.scale(
@@ -208,26 +332,34 @@ class SongSelect(State):
         self.back_button_rect.x = self.back_button_rect.y = 10
 
         self.info_overlay = Surface((self.ctx.SCREEN_WIDTH, self.ctx.SCREEN_HEIGHT))
-        self.info_overlay.set_alpha(0)
         self.info_overlay.fill((0, 0, 0))
 
-        self.info_pad = self.ctx.image_cache["assets/info_pad.jpg"]
-        self.info_pad = pg.transform.scale(self.info_pad, (0, 0)).convert_alpha()
-        self.info_pad_rect = self.info_pad.get_rect(center=self.ctx.Display.get_rect().center)
-
         font_scale = 20
         self.font = font.Font(f"{ROOT_DIR}/fonts/KozGoPro-Bold.otf", self.ctx.SCREEN_HEIGHT // font_scale)
-        self.song_text = self.font.render(
-            f"【{Conf.text == Conf.JP and self.song_ref.prod or self.song_ref.prod_en}】{Conf.text == Conf.JP and self.song_ref.name or self.song_ref.name_en}",
-            True,
-            (255, 255, 255),
-        )
-        self.song_text.set_alpha(200)
-        self.song_text_rect = self.song_text.get_rect(center=self.ctx.Display.get_rect().center)
-        self.song_text_rect.centery = self.info_button_rect.centery
+        self.info_font = font.Font(f"{ROOT_DIR}/fonts/KozGoPro-Bold.otf", 0)
+
+        self.prefetcher = SongPrefetcher(self)
+
+    def enter(self) -> None:
+        self.prefetcher.start()
+
+        if self.ctx.target_map:
+            # Just played, so what was prepared for it shows its old grades
+            self.prefetcher.evict(self.ctx.target_map)
+            song_idx = self.ctx.song_names.index(self.ctx.target_map)
+        else:
+            song_idx = random.randint(0, len(self.ctx.song_cache) - 1)
+
+        self.prev_img: Optional[Surface] = None
+        self.show_song(song_idx)
+
+        self.diff_arrow_rect.centerx = self.normal_diff_rect.centerx
 
         # INFO THINGS
-        self.info_font = font.Font(f"{ROOT_DIR}/fonts/KozGoPro-Bold.otf", 0)
+        self.info_overlay.set_alpha(0)
+        self.info_pad = self.ctx.image_cache["assets/info_pad.jpg"]
+        self.info_pad = pg.transform.scale(self.info_pad, (0, 0)).convert_alpha()
+        self.info_pad_rect = self.info_pad.get_rect(center=self.ctx.Display.get_rect().center)
         self.info_song_text = self.info_font.render("", True, (255, 255, 255))
         self.info_song_text_rect = self.info_pad.get_rect().center
         self.info_prod_text = self.info_font.render("", True, (255, 255, 255))
@@ -265,19 +397,23 @@ class SongSelect(State):
         self.pad_zoom_scale = 0
         self.info_font_scale = 110
         self.info_avatar_scale = 0
+        # 0 => closed, 1 => open
+        self.info_progress = 0.0
 
         self.switching = False
         self.switching_left = False
 
-        self.prev_percent: int = 0
+        self.prev_percent: float = 0
 
-        self.ctx.mixer.unload()
-        self.ctx.mixer.load(f"{ROOT_DIR}/{self.song_ref.lite_song_path}")
-        self.ctx.mixer.set_volume(0.4)
-        self.ctx.mixer.play()
+    def exit(self) -> None:
+        # Nothing more needs preparing until it's shown again
+        self.prefetcher.close()
 
     def load_diamond_and_rank(
-        self, grade: Literal["AP", "FC", "CL", "NA"], rank: Literal["C", "B", "A", "S"], button_rect: Rect
+        self,
+        grade: Literal["AP", "FC", "CL", "NA"],
+        rank: Literal["C", "B", "A", "S"],
+        button_rect: Rect,
     ) -> Tuple[Surface, Rect, Surface, Rect]:
 
         diamond = self.ctx.image_cache[f"assets/diamond_{grade}.jpg"]
@@ -306,9 +442,9 @@ class SongSelect(State):
 
         return (diamond, diamond_rect, text, text_rect)
 
-    def load_lite_img(self) -> Surface:
+    def scale_lite_img(self, song_ref: SongData) -> Surface:
         scale = self.ctx.SCREEN_WIDTH * 0.6 / self.ctx.image_cache["assets/frame90.jpg"].get_width()
-        img = self.ctx.image_cache[self.song_ref.lite_img]
+        img = self.ctx.image_cache[song_ref.lite_img]
 
         img = pg.transform.scale(img, (img.get_width() * scale, img.get_height() * scale)).convert_alpha()
 
@@ -336,64 +472,57 @@ class SongSelect(State):
         self.hover_left = False
 
         self.prev_img = self.lite_img
+        self.show_song(self.song_idx)
+
+        self.prev_percent = 100
+
+    def show_song(self, song_idx: int) -> None:
+        self.song_idx = song_idx
         self.song_ref = self.ctx.song_cache[self.ctx.song_names[self.song_idx]]
-        self.lite_img = self.load_lite_img()
+        self.prepared = self.prefetcher.get(self.ctx.song_names[self.song_idx])
+        self.lite_img = self.prepared.lite_img
 
-        self.song_text = self.font.render(
-            f"【{Conf.text == Conf.JP and self.song_ref.prod or self.song_ref.prod_en}】{Conf.text == Conf.JP and self.song_ref.name or self.song_ref.name_en}",
-            True,
-            (255, 255, 255),
-        )
-        self.song_text.set_alpha(200)
+        self.song_text = self.prepared.song_text
         self.song_text_rect = self.song_text.get_rect(center=self.ctx.Display.get_rect().center)
         self.song_text_rect.centery = self.info_button_rect.centery
 
-        self.easy_diff = self.diff_font.render("Easy", True, (255, 255, 255))
-        self.easy_num = self.num_font.render(str(self.song_ref.difficulty.easy), True, (255, 255, 255))
+        self.easy_num = self.prepared.nums["easy"]
         self.easy_num_rect = self.easy_num.get_rect(center=self.button_easy_rect.center)
         self.easy_num_rect.centery = (self.button_easy_rect.bottom + self.easy_diff_rect.bottom) // 2
-        self.normal_diff = self.diff_font.render("Normal", True, (255, 255, 255))
-        self.normal_num = self.num_font.render(str(self.song_ref.difficulty.normal), True, (255, 255, 255))
+        self.normal_num = self.prepared.nums["normal"]
         self.normal_num_rect = self.normal_num.get_rect(center=self.button_normal_rect.center)
         self.normal_num_rect.centery = (self.button_normal_rect.bottom + self.normal_diff_rect.bottom) // 2
-        self.hard_diff = self.diff_font.render("Hard", True, (255, 255, 255))
-        self.hard_num = self.num_font.render(str(self.song_ref.difficulty.hard), True, (255, 255, 255))
+        self.hard_num = self.prepared.nums["hard"]
         self.hard_num_rect = self.hard_num.get_rect(center=self.button_hard_rect.center)
         self.hard_num_rect.centery = (self.button_hard_rect.bottom + self.hard_diff_rect.bottom) // 2
-        self.master_diff = self.diff_font.render("Master", True, (255, 255, 255))
-        self.master_num = self.num_font.render(str(self.song_ref.difficulty.master), True, (255, 255, 255))
+        self.master_num = self.prepared.nums["master"]
         self.master_num_rect = self.master_num.get_rect(center=self.button_master_rect.center)
         self.master_num_rect.centery = (self.button_master_rect.bottom + self.master_diff_rect.bottom) // 2
 
-        self.diamond_easy, self.diamond_easy_rect, self.grade_easy, self.grade_easy_rect = self.load_diamond_and_rank(
-            self.song_ref.diamond.easy, self.song_ref.grade.easy, self.button_easy_rect
-        )
+        self.diamond_easy, self.diamond_easy_rect, self.grade_easy, self.grade_easy_rect = self.prepared.ranks["easy"]
         (
             self.diamond_normal,
             self.diamond_normal_rect,
             self.grade_normal,
             self.grade_normal_rect,
-        ) = self.load_diamond_and_rank(
-            self.song_ref.diamond.normal, self.song_ref.grade.normal, self.button_normal_rect
-        )
-        self.diamond_hard, self.diamond_hard_rect, self.grade_hard, self.grade_hard_rect = self.load_diamond_and_rank(
-            self.song_ref.diamond.hard, self.song_ref.grade.hard, self.button_hard_rect
-        )
+        ) = self.prepared.ranks["normal"]
+        self.diamond_hard, self.diamond_hard_rect, self.grade_hard, self.grade_hard_rect = self.prepared.ranks["hard"]
         (
             self.diamond_master,
             self.diamond_master_rect,
             self.grade_master,
             self.grade_master_rect,
-        ) = self.load_diamond_and_rank(
-            self.song_ref.diamond.master, self.song_ref.grade.master, self.button_master_rect
-        )
+        ) = self.prepared.ranks["master"]
 
-        # Change the previewing song
-        self.ctx.mixer.load(f"{ROOT_DIR}/{self.song_ref.lite_song_path}")
-        self.ctx.mixer.set_volume(0.4)
-        self.ctx.mixer.play()
+        # Start preparing the new neighbours
+        self.prefetcher.around(self.song_idx)
 
-        self.prev_percent = 100
+        # Change the previewing song. Until the worker has decoded it, it's streamed rather than decoded here
+        self.ctx.mixer.set_volume(0.4)
+        if (preview := f"{ROOT_DIR}/{self.song_ref.lite_song_path}") in self.ctx.sounds:
+            self.ctx.mixer.play_loop(self.ctx.sounds.get(preview))
+        else:
+            self.ctx.mixer.stream(preview)
 
     def switch_difficulty(self) -> None:
         if self.hover_easy:
@@ -422,12 +551,12 @@ class SongSelect(State):
 
     def animate_info(self) -> None:
         if self.phase_info:
-            if self.info_overlay.get_alpha() >= 220:  # type: ignore
+            if self.info_progress >= 1:
                 self.phase_info = False
                 self.showing_info = True
                 return
         elif self.unphase_info:
-            if self.info_overlay.get_alpha() <= 0:  # type: ignore
+            if self.info_progress <= 0:
                 self.unphase_info = False
                 self.showing_info = False
 
@@ -437,9 +566,14 @@ class SongSelect(State):
                 return
 
         if self.phase_info:
-            self.info_overlay.set_alpha(self.info_overlay.get_alpha() + 11)  # type: ignore
+            self.info_progress = min(self.info_progress + self.ctx.dt / INFO_ANIMATION_TIME, 1)
         elif self.unphase_info:
-            self.info_overlay.set_alpha(self.info_overlay.get_alpha() - 11)  # type: ignore
+            self.info_progress = max(self.info_progress - self.ctx.dt / INFO_ANIMATION_TIME, 0)
+
+        self.info_overlay.set_alpha(floor(220 * self.info_progress))
+        self.pad_zoom_scale = 0.4 * self.info_progress
+        self.info_font_scale = 110 - 75 * self.info_progress
+        self.info_avatar_scale = self.ctx.SCREEN_HEIGHT / 6.75 * 20 / 22 * self.info_progress
 
         self.info_pad = self.ctx.image_cache["assets/info_pad.jpg"]
         scale = self.ctx.SCREEN_WIDTH * self.pad_zoom_scale / self.info_pad.get_width()
@@ -529,24 +663,12 @@ class SongSelect(State):
             self.info_disclaimer = Surface((0, 0), SRCALPHA)
             self.info_disclaimer_rect = Rect(0, 0, 0, 0)
 
-        if self.phase_info:
-            self.pad_zoom_scale += 0.4 / 20
-            self.info_font_scale -= 75 / 20
-            self.info_avatar_scale += (self.ctx.SCREEN_HEIGHT / 6.75) / 22
-        elif self.unphase_info:
-            self.pad_zoom_scale -= 0.4 / 20
-            self.info_font_scale += 75 / 20
-            self.info_avatar_scale -= (self.ctx.SCREEN_HEIGHT / 6.75) / 22
-
     def update(self) -> None:
-        # Loop the preview music
-        music_pos = self.ctx.mixer.get_music_pos()
-        if music_pos == -1:
-            self.ctx.mixer.load(f"{ROOT_DIR}/{self.song_ref.lite_song_path}")
-            self.ctx.mixer.set_volume(0.4)
-            self.ctx.mixer.play()
+        cursor = self.ctx.mouse_pos()
 
-        cursor = pg.mouse.get_pos()
+        # Not while animating, which would stutter for the few ms a song takes to prepare
+        if not (self.switching or self.phase_info or self.unphase_info):
+            self.prefetcher.step()
 
         if self.switching:
             if self.prev_percent <= 0:
@@ -555,13 +677,13 @@ class SongSelect(State):
                 self.prev_img = None
                 return
 
-            # Fast to slow wipe effect
+            # Fast to slow wipe effect, in percent per second
             if self.prev_percent > 40:
-                self.prev_percent -= 8
+                self.prev_percent -= 480 * self.ctx.dt
             elif self.prev_percent > 25:
-                self.prev_percent -= 3
+                self.prev_percent -= 180 * self.ctx.dt
             elif self.prev_percent > 0:
-                self.prev_percent -= 1
+                self.prev_percent -= 60 * self.ctx.dt
 
         elif self.phase_info or self.unphase_info:
             self.animate_info()
@@ -624,16 +746,11 @@ class SongSelect(State):
                 ) if self.frame_rect.left < x < self.frame_rect.right and self.frame_rect.top < y < self.frame_rect.bottom and (
                     self.lite_img.get_at([x - self.frame_rect.x, y - self.frame_rect.y])[3] > 0
                 ) and not self.back:
-                    self.lite_img = self.load_lite_img()
-
-                    if self.difficulty == Difficulty.Easy:
-                        self.lite_img.fill((0, 50, 30), special_flags=pg.BLEND_ADD)
-                    elif self.difficulty == Difficulty.Normal:
-                        self.lite_img.fill((0, 30, 50), special_flags=pg.BLEND_ADD)
-                    elif self.difficulty == Difficulty.Hard:
-                        self.lite_img.fill((50, 0, 30), special_flags=pg.BLEND_ADD)
-                    elif self.difficulty == Difficulty.Master:
-                        self.lite_img.fill((30, 0, 50), special_flags=pg.BLEND_ADD)
+                    new_tint = self.difficulty not in self.prepared.tints
+                    self.lite_img = self.prepared.tinted(self.difficulty)
+                    if new_tint:
+                        # Counted again, as it's grown since it was stored
+                        self.prefetcher.store(self.ctx.song_names[self.song_idx], self.prepared)
 
                     self.hover_play = True
                 # Difficulty buttons
@@ -718,7 +835,7 @@ class SongSelect(State):
                     self.hard_diff.set_alpha(255)
                     self.hard_num.set_alpha(255)
                 case _:
-                    self.lite_img = self.load_lite_img()
+                    self.lite_img = self.prepared.lite_img
                     self.rmap_button.set_alpha(255)
                     self.lmap_button.set_alpha(255)
                     self.back_button.set_alpha(255)
@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import mmap
+import multiprocessing
+import os
+import struct
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from io import BytesIO
+from math import floor
+from multiprocessing import shared_memory
+from threading import Condition, Thread
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import pygame as pg
+from pygame.surface import Surface
+
+from .conf import Conf
+from .lib import panic
+
+if TYPE_CHECKING:
+    from .app import App
+
+ROOT_DIR = Conf.ROOT_DIR
+
+# Magic and frame count, followed by frame_count + 1 absolute offsets and then the encoded frames back to back
+PACKED_MAGIC = b"PBMV"
+PACKED_HEADER = struct.Struct("<4sI")
+PACKED_OFFSET = struct.Struct("<Q")
+
+
+class FrameDirectory:
+    """
+    Frames stored as numbered JPEGs in a directory, i.e. {image_name}1.jpg, {image_name}2.jpg, ...
+    """
+
+    def __init__(self, path: str, image_name: str) -> None:
+        self.path = path
+        self.image_name = image_name
+        self.frame_count = len(os.listdir(self.path))
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, idx: int) -> str:
+        return f"{self.path}/{self.image_name}{idx}.jpg"
+
+    def close(self) -> None:
+        pass
+
+
+class PackedFrames:
+    """
+    Frames stored in a single file made by pack_frames(), read through a memory map
+
+    Opening it doesn't scan a directory and any frame can be found in O(1) from the offset table
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+        with open(self.path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.frame_count = b"", 0
+        if len(self.mm) >= PACKED_HEADER.size:
+            magic, self.frame_count = PACKED_HEADER.unpack_from(self.mm, 0)
+
+        # A truncated file would otherwise have frames read from past its end
+        table_end = PACKED_HEADER.size + (self.frame_count + 1) * PACKED_OFFSET.size
+        if magic != PACKED_MAGIC or len(self.mm) < table_end:
+            self.mm.close()
+            raise ValueError(panic(f"{self.path} is not a packed MV"))
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, idx: int) -> bytes:
+        # Frames are numbered from 1
+        if not 1 <= idx <= self.frame_count:
+            raise IndexError(f"frame {idx} of a {self.frame_count} frame MV")
+
+        table = PACKED_HEADER.size + (idx - 1) * PACKED_OFFSET.size
+        (start,) = PACKED_OFFSET.unpack_from(self.mm, table)
+        (end,) = PACKED_OFFSET.unpack_from(self.mm, table + PACKED_OFFSET.size)
+        return self.mm[start:end]
+
+    def close(self) -> None:
+        self.mm.close()
+
+
+def pack_frames(frames_path: str, image_name: str, out_path: str) -> int:
+    """
+    Packs a directory of numbered frames into a single file that PackedFrames can read
+
+    Returns the number of frames packed
+    """
+    frames = FrameDirectory(frames_path, image_name)
+    frame_count = len(frames)
+
+    if not frame_count:
+        raise FileNotFoundError(panic(f"{frames_path} has no frames"))
+
+    for idx in range(1, frame_count + 1):
+        if not os.path.isfile(frames[idx]):
+            raise FileNotFoundError(panic(f"Frame {idx} is missing; expected {frames[idx]}"))
+
+    offsets: List[int] = []
+    offset = PACKED_HEADER.size + (frame_count + 1) * PACKED_OFFSET.size
+
+    for idx in range(1, frame_count + 1):
+        offsets.append(offset)
+        offset += os.path.getsize(frames[idx])
+    offsets.append(offset)
+
+    # Write next to the destination first so a half packed file never replaces a good one
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(PACKED_HEADER.pack(PACKED_MAGIC, frame_count))
+        for offset in offsets:
+            out.write(PACKED_OFFSET.pack(offset))
+
+        for idx in range(1, frame_count + 1):
+            with open(frames[idx], "rb") as f:
+                out.write(f.read())
+
+    os.replace(tmp_path, out_path)
+
+    return frame_count
+
+
+def open_frames(rpath: str, image_name: str) -> Optional[FrameDirectory | PackedFrames]:
+    """
+    Finds the frames of an MV; either a packed file at rpath or rpath.pbv, or a directory at rpath. None if there
+    are none, including when there's a file or directory with no frames in it
+    """
+    path = f"{ROOT_DIR}/{rpath}"
+    frames: Optional[FrameDirectory | PackedFrames] = None
+
+    if os.path.isfile(path):
+        frames = PackedFrames(path)
+    elif os.path.isfile(f"{path}.pbv"):
+        frames = PackedFrames(f"{path}.pbv")
+    elif os.path.isdir(path):
+        frames = FrameDirectory(path, image_name)
+
+    if frames is not None and not len(frames):
+        frames.close()
+        return None
+
+    return frames
+
+
+def load_frame(frame: str | bytes) -> Surface:
+    if isinstance(frame, bytes):
+        return pg.image.load(BytesIO(frame))
+
+    return pg.image.load(frame)
+
+
+class Video:
+    """
+    Streams an MV from its frames, either numbered JPEGs in a FrameDirectory or a single PackedFrames file
+
+    A single decoder thread keeps a fixed size ring buffer filled a few seconds ahead of the song clock, so memory
+    stays the same whatever the length of the song. If the decoder falls behind, frames are skipped rather than waited
+    on
+    """
+
+    def __init__(self, ctx: App, frames: FrameDirectory | PackedFrames) -> None:
+        self.ctx = ctx
+        self.frames = frames
+
+        self.fps = Conf.MV_FPS
+        self.frame_count = len(self.frames)
+
+        self.capacity = self.fps * Conf.MV_BUFFER_SECONDS
+        # Frame n lives in slot n % capacity, alongside its number so stale slots can be told apart
+        self.ring: List[Optional[Tuple[int, Surface]]] = [None for _ in range(self.capacity)]
+
+        self.cond = Condition()
+        # The frame the renderer wants now, and the next one the decoder will load. Frames are numbered from 1
+        self.target: int = 1
+        self.load_curr: int = 1
+
+        self.current: Optional[Surface] = None
+        # The number of the frame in current
+        self.shown: Optional[int] = None
+        self.dropped: int = 0
+
+        self.running = False
+        self.worker: Optional[Thread] = None
+
+    def start(self) -> None:
+        # The ring buffer can't be evicted, but it still counts towards the budget
+        self.ctx.memory.track(
+            "video", str(id(self)), self.capacity * self.ctx.SCREEN_WIDTH * self.ctx.SCREEN_HEIGHT * 4
+        )
+
+        self.running = True
+        self.worker = Thread(target=self.decode, daemon=True)
+        self.worker.start()
+
+    def load_and_scale(self, idx: int) -> Surface:
+        """
+        *Runs on the decoder thread, so the frame is left in whatever format it was loaded in. Converting it for the
+        display is left to show()
+        """
+        frame = load_frame(self.frames[idx])
+        return pg.transform.scale(frame, (self.ctx.SCREEN_WIDTH, self.ctx.SCREEN_HEIGHT))
+
+    def show(self, frame: Surface) -> Surface:
+        """
+        Readies a decoded frame for blitting, once when it's first shown
+
+        *Main thread only
+        """
+        frame = frame.convert_alpha()
+        frame.set_alpha(30)
+        return frame
+
+    def decode(self) -> None:
+        while 1:
+            with self.cond:
+                # Sleep while the buffer is full or the video has been fully decoded
+                while self.running and (
+                    self.load_curr >= self.target + self.capacity or self.load_curr > self.frame_count
+                ):
+                    self.cond.wait()
+
+                if not self.running:
+                    return
+
+                # Fell behind the song; skip straight to what's needed now
+                if self.load_curr < self.target:
+                    self.load_curr = self.target
+
+                idx = self.load_curr
+
+            try:
+                frame: Optional[Surface] = self.load_and_scale(idx)
+            except Exception as e:
+                # One bad frame is shown as a dropped one rather than ending the decoder and freezing the MV
+                print(panic(f"Failed to decode MV frame {idx}: {e!r}"))
+                frame = None
+
+            with self.cond:
+                self.ring[idx % self.capacity] = frame and (idx, frame)
+                self.load_curr = idx + 1
+
+    def frame_at(self, pos: int) -> Optional[Surface]:
+        """
+        Returns the frame for a song position in milliseconds; the last shown frame if that one isn't ready yet
+        """
+        idx = min(floor(max(pos, 0) / 1000 * self.fps) + 1, self.frame_count)
+
+        with self.cond:
+            if idx != self.target:
+                self.target = idx
+                self.cond.notify()
+
+            slot = self.ring[idx % self.capacity]
+            if slot is not None and slot[0] == idx:
+                if idx != self.shown:
+                    self.current, self.shown = self.show(slot[1]), idx
+                    self.cond.notify()
+            else:
+                self.dropped += 1
+
+        return self.current
+
+    def unload(self) -> None:
+        """
+        Stops the decoder and frees the ring buffer
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+        if self.worker:
+            self.worker.join()
+
+        self.ring = [None for _ in range(self.capacity)]
+        self.current = None
+        self.shown = None
+        self.load_curr = self.target = 1
+
+        self.frames.close()
+        self.ctx.memory.untrack("video", str(id(self)))
+
+
+def decode_frame(shm_name: str, offset: int, frame: str | bytes, size: Tuple[int, int]) -> None:
+    """
+    Decodes and scales one frame straight into a shared memory slot as RGBA
+
+    *Runs in a worker process
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        dest = pg.image.frombuffer(shm.buf[offset : offset + size[0] * size[1] * 4], size, "RGBA")
+        dest.blit(pg.transform.scale(load_frame(frame), size), (0, 0))
+        # The Surface holds a view of the buffer, which has to be released before the block can be closed
+        del dest
+    finally:
+        shm.close()
+
+
+class SharedMemoryVideo(Video):
+    """
+    A Video whose frames are decoded by a pool of processes instead of a thread, so decoding isn't held up by the GIL
+
+    Frames are written into a block of shared memory with one slot per ring buffer entry; the main process wraps each
+    slot in a Surface once and blits from it directly, without copying. The slot of the frame being shown is never
+    written to until another one is shown, so it can't tear
+    """
+
+    def __init__(self, ctx: App, frames: FrameDirectory | PackedFrames) -> None:
+        super().__init__(ctx, frames)
+
+        self.size = (self.ctx.SCREEN_WIDTH, self.ctx.SCREEN_HEIGHT)
+        self.frame_bytes = self.size[0] * self.size[1] * 4
+        self.processes = min(Conf.MV_DECODE_PROCESSES, self.capacity)
+
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        # Views of the block each slot Surface wraps, released by unload() before the block is closed
+        self.views: List[memoryview] = []
+        self.slots: List[Surface] = []
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * self.capacity)
+
+        for slot in range(self.capacity):
+            offset = slot * self.frame_bytes
+            view = self.shm.buf[offset : offset + self.frame_bytes]
+            surface = pg.image.frombuffer(view, self.size, "RGBA")
+            surface.set_alpha(30)
+            self.views.append(view)
+            self.slots.append(surface)
+
+        # Forking would copy SDL's and the mixer's threads' state into the workers half way through whatever they
+        # were doing
+        self.pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+        super().start()
+
+    def show(self, frame: Surface) -> Surface:
+        # Slot Surfaces are made once, already in a format that can be blitted
+        return frame
+
+    def decode(self) -> None:
+        assert self.shm and self.pool
+
+        pending: Dict[int, Future] = {}
+
+        while 1:
+            with self.cond:
+                if not self.running:
+                    return
+
+                # Fell behind the song; skip straight to what's needed now
+                if self.load_curr < self.target:
+                    self.load_curr = self.target
+
+                while (
+                    len(pending) < self.processes
+                    and self.load_curr < self.target + self.capacity
+                    and self.load_curr <= self.frame_count
+                ):
+                    idx = self.load_curr
+                    slot = idx % self.capacity
+
+                    # A skipped frame may still be writing into the slot this one needs, or it's still being shown
+                    showing = self.shown is not None and self.shown % self.capacity == slot
+                    if showing or any(i % self.capacity == slot for i in pending):
+                        break
+
+                    # Being rewritten, so whatever frame it held can't be shown any more
+                    self.ring[slot] = None
+                    pending[idx] = self.pool.submit(
+                        decode_frame,
+                        self.shm.name,
+                        slot * self.frame_bytes,
+                        self.frames[idx],
+                        self.size,
+                    )
+                    self.load_curr += 1
+
+                if not pending:
+                    # Buffer is full or the video has been fully decoded
+                    self.cond.wait()
+                    continue
+
+            wait(pending.values(), return_when=FIRST_COMPLETED)
+
+            for idx, future in list(pending.items()):
+                if future.done():
+                    del pending[idx]
+
+                    if (e := future.exception()) is not None:
+                        # Left empty, so it's shown as a dropped frame
+                        print(panic(f"Failed to decode MV frame {idx}: {e!r}"))
+                        continue
+
+                    with self.cond:
+                        self.ring[idx % self.capacity] = (idx, self.slots[idx % self.capacity])
+
+    def unload(self) -> None:
+        super().unload()
+
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+        # Every Surface wrapping the block must be gone before its views can be released, and they before the block
+        # can be closed. The ring and current were cleared by Video.unload()
+        self.slots = []
+        for view in self.views:
+            view.release()
+        self.views = []
+
+        if self.shm:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from itertools import count
+from threading import Condition, Thread
+from typing import Callable, Hashable, Optional
+
+from .lib import panic
+
+
+class Writer:
+    """
+    Runs the game's disk writes one after another on a background thread, so no frame ever waits on them
+
+    A job submitted under the same key as one that hasn't run yet replaces it, as only the latest write matters
+    """
+
+    def __init__(self) -> None:
+        self.jobs: OrderedDict[Hashable, Callable[[], None]] = OrderedDict()
+        self.cond = Condition()
+        # Keys for jobs that must never be coalesced
+        self.unique = count()
+
+        self.running = True
+        self.busy = False
+
+        self.worker = Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def submit(self, job: Callable[[], None], key: Optional[Hashable] = None) -> None:
+        with self.cond:
+            if key is None:
+                key = ("unique", next(self.unique))
+
+            # Goes to the back either way, so it still runs after everything submitted before it
+            self.jobs.pop(key, None)
+            self.jobs[key] = job
+            self.cond.notify_all()
+
+    def work(self) -> None:
+        while 1:
+            with self.cond:
+                while self.running and not self.jobs:
+                    self.cond.wait()
+
+                if not self.jobs:
+                    return
+
+                _, job = self.jobs.popitem(last=False)
+                self.busy = True
+
+            try:
+                job()
+            except Exception as e:
+                # Losing one save is better than losing the thread and every save after it
+                print(panic(f"Failed to save: {e!r}"))
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def flush(self) -> None:
+        """
+        Blocks until every job submitted so far has run
+        """
+        with self.cond:
+            while self.jobs or self.busy:
+                self.cond.wait()
+
+    def close(self) -> None:
+        """
+        Runs whatever is left and stops the thread. Safe to call more than once
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+        self.worker.join()
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import pytest
+
+from pybeats.avatars import AvatarFetcher
+
+AVATAR = b"\x89PNG not really"
+
+
+class Server:
+    """
+    A stand-in for github, serving AVATAR for every mapper except "missing"
+    """
+
+    def __init__(self) -> None:
+        self.paths: List[str] = []
+        self.delay = 0.0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.paths.append(self.path)
+                time.sleep(server.delay)
+
+                if self.path.startswith("/missing"):
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(AVATAR)))
+                self.end_headers()
+                self.wfile.write(AVATAR)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/{{mapper}}.png"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def server() -> Iterator[Server]:
+    server = Server()
+    yield server
+    server.httpd.shutdown()
+
+
+def test_fetches_then_reads_cache(server: Server, tmp_path) -> None:
+    fetcher = AvatarFetcher(str(tmp_path), url=server.url, timeout=1)
+
+    assert fetcher.fetch("someone") == AVATAR
+    assert fetcher.fetch("someone") == AVATAR
+    assert server.paths == ["/someone.png"]
+    fetcher.close()
+
+
+def test_expired_cache_is_refetched(server: Server, tmp_path) -> None:
+    fetcher = AvatarFetcher(str(tmp_path), url=server.url, timeout=1, expiry=60)
+    fetcher.write_cache("someone", b"old")
+    os.utime(fetcher.cache_path("someone"), (0, 0))
+
+    assert fetcher.fetch("someone") == AVATAR
+    fetcher.close()
+
+
+def test_stale_cache_when_offline(server: Server, tmp_path) -> None:
+    fetcher = AvatarFetcher(str(tmp_path), url=server.url, timeout=0.2, expiry=60)
+    fetcher.write_cache("someone", b"old")
+    os.utime(fetcher.cache_path("someone"), (0, 0))
+    server.delay = 1
+
+    start = time.perf_counter()
+    assert fetcher.fetch("someone") == b"old"
+    assert time.perf_counter() - start < 1
+    fetcher.close()
+
+
+def test_missing_avatar(server: Server, tmp_path) -> None:
+    fetcher = AvatarFetcher(str(tmp_path), url=server.url, timeout=1)
+
+    assert fetcher.fetch("missing") is None
+    fetcher.close()
+
+
+def test_mapper_name_stays_in_cache_dir(server: Server, tmp_path) -> None:
+    cache_dir = tmp_path / "avatars"
+    fetcher = AvatarFetcher(str(cache_dir), url=server.url, timeout=1)
+
+    assert fetcher.fetch("../x") == AVATAR
+    assert os.listdir(tmp_path) == ["avatars"]
+    assert os.path.dirname(os.path.abspath(fetcher.cache_path("../x"))) == str(cache_dir)
+    assert server.paths == ["/..%2Fx.png"]
+    fetcher.close()
+
+
+def test_worker_never_blocks_the_caller(server: Server, tmp_path) -> None:
+    fetcher = AvatarFetcher(str(tmp_path), url=server.url, timeout=2)
+    server.delay = 0.5
+
+    start = time.perf_counter()
+    fetcher.request("someone", "key")
+    assert fetcher.poll() == []
+    assert time.perf_counter() - start < 0.1
+
+    deadline = time.time() + 5
+    finished = []
+    while not finished and time.time() < deadline:
+        finished = fetcher.poll()
+        time.sleep(0.01)
+
+    assert finished == [("key", AVATAR)]
+    fetcher.close()
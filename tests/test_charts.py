@@ -0,0 +1,39 @@
+import json
+
+from pybeats import charts
+
+
+def meta(chart):
+    return {f"map_{difficulty}": chart for difficulty in charts.DIFFICULTIES}
+
+
+def test_beat_zero_is_allowed() -> None:
+    errors, _ = charts.validate("song", meta({"0": [{"l": 1, "w": 1, "t": "t"}], "4": [{"l": 2, "w": 1, "t": "t"}]}))
+    assert errors == []
+
+
+def test_beats_out_of_order() -> None:
+    errors, _ = charts.validate("song", meta({"4": [{"l": 1, "w": 1, "t": "t"}], "2": [{"l": 2, "w": 1, "t": "t"}]}))
+    assert "easy: beat 2 comes after beat 4" in errors
+
+
+def test_lane_and_width_must_be_numbers() -> None:
+    errors, _ = charts.validate("song", meta({"1": [{"l": "1", "w": 1, "t": "t"}, {"l": 1, "t": "t"}]}))
+    assert "easy: beat 1: lane '1' and width 1 must both be whole numbers" in errors
+    assert "easy: beat 1: lane 1 and width None must both be whole numbers" in errors
+
+
+def test_unreadable_compiled_charts_are_a_miss(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(charts, "ROOT_DIR", tmp_path)
+    monkeypatch.setattr(charts, "COMPILED_DIR", tmp_path / "charts")
+    (tmp_path / "beatmaps" / "song").mkdir(parents=True)
+    (tmp_path / "beatmaps" / "song" / "meta.toml").write_text("")
+    (tmp_path / "charts").mkdir()
+
+    path = tmp_path / "charts" / "song.json"
+    for compiled in ({"meta": {}}, [], {"source": charts.source_stamp("song")}):
+        path.write_text(json.dumps(compiled))
+        assert charts.load_compiled("song") is None
+
+    path.write_text(json.dumps({"source": charts.source_stamp("song"), "meta": {"name": "song"}}))
+    assert charts.load_compiled("song") == {"name": "song"}
@@ -0,0 +1,126 @@
+import os
+import random
+from typing import Callable, List, Optional
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pytest
+
+from pybeats.conf import Conf
+from pybeats.lib import Difficulty, Note, NoteData
+from pybeats.replay import Replay, ReplayRecorder
+
+BPM = 460
+
+
+def chart() -> NoteData:
+    notes = {}
+    for bar in range(4):
+        beat = 8 + bar * 48
+        # A hold leading a chord, then one following a tap
+        notes[str(beat)] = [
+            Note({"l": 1, "w": 2, "t": "h", "ln": 8, "p": bar * 2 + 1}),
+            Note({"l": 5, "w": 2, "t": "t"}),
+        ]
+        notes[str(beat + 8)] = [Note({"l": 1, "w": 2, "t": "hr", "p": bar * 2 + 1}), Note({"l": 4, "w": 1, "t": "t"})]
+        notes[str(beat + 16)] = [
+            Note({"l": 3, "w": 2, "t": "t"}),
+            Note({"l": 6, "w": 2, "t": "h", "ln": 12, "p": bar * 2 + 2}),
+        ]
+        notes[str(beat + 28)] = [Note({"l": 6, "w": 2, "t": "hr", "p": bar * 2 + 2})]
+        notes[str(beat + 36)] = [Note({"l": 1, "w": 8, "t": "t"})]
+    return NoteData(notes)
+
+
+def record(lanes: Callable[[int], List[bool]], frames: int = 3600) -> Replay:
+    """
+    A replay of the lanes as lanes(frame) has them, 60 frames a second
+    """
+    recorder = ReplayRecorder(Replay("dokuzu", Difficulty.Normal, b"", {}))
+    for idx in range(frames):
+        recorder.frame(idx * 1000 // 60, lanes(idx), 1 / 60)
+    return recorder.replay
+
+
+def scripted(seed: int) -> Replay:
+    """
+    Lanes that go down and up at random, so holds are held across frames as often as they're let go of
+    """
+    rnd = random.Random(seed)
+    lanes = [False for _ in range(8)]
+
+    def toggle(_: int) -> List[bool]:
+        for lane in range(8):
+            if rnd.random() < 0.08:
+                lanes[lane] = not lanes[lane]
+        return lanes
+
+    return record(toggle)
+
+
+@pytest.fixture(scope="module")
+def app():
+    import pybeats.app as app_module
+    from pybeats.states.loading import Loading
+
+    game = app_module.App(Loading)
+    while (progress := game.load_cache())[0] < progress[1]:
+        pass
+
+    yield game
+    game.close()
+
+
+def play(app, engine: str, replay: Replay, notes: Optional[NoteData] = None):
+    from pybeats.app import Conductor
+    from pybeats.states.ingame import InGame
+
+    Conf.NOTE_ENGINE, engine = engine, Conf.NOTE_ENGINE
+    try:
+        app.replay = replay
+        app.conductor = Conductor(app, BPM, "dokuzu", notes or chart(), Difficulty.Normal)
+        app.setState(InGame)
+        while not app._state.done:
+            app.update()
+        return app._state
+    finally:
+        Conf.NOTE_ENGINE = engine
+        app.replay = None
+        app.mixer.unload()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_note_engines_judge_the_same(app, seed: int) -> None:
+    objects = play(app, "objects", scripted(seed))
+    objects_counts, objects_total = dict(objects.score.counts), objects.score.total
+
+    numpy = play(app, "numpy", scripted(seed))
+    assert (dict(numpy.score.counts), numpy.score.total) == (objects_counts, objects_total)
+
+
+@pytest.mark.parametrize("engine", ["objects", "numpy"])
+def test_replay_judges_every_note_once(app, engine: str) -> None:
+    state = play(app, engine, scripted(1))
+
+    assert state.result
+    assert state.score.total == state.ctx.conductor.note_count == sum(state.score.counts.values())
+
+
+@pytest.mark.parametrize("engine", ["objects", "numpy"])
+@pytest.mark.parametrize("phase", [0, 1])
+def test_held_hold_is_judged_once(app, engine: str, phase: int) -> None:
+    notes = NoteData(
+        {
+            "8": [Note({"l": 1, "w": 2, "t": "h", "ln": 16, "p": 1}), Note({"l": 5, "w": 2, "t": "t"})],
+            "24": [Note({"l": 1, "w": 2, "t": "hr", "p": 1})],
+        }
+    )
+    # The hold's lanes are held throughout, while the tap's flicker, so on one phase or the other the tap is hit on
+    # a later frame than the hold went down on
+    state = play(app, engine, record(lambda idx: [True, True, False, False] + [(idx + phase) % 2 == 0] * 4), notes)
+
+    assert state.result
+    assert state.score.total == 3
+    # The release is never let go of
+    assert state.score.counts["MISS"] == 1
@@ -0,0 +1,49 @@
+import os
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy
+import pygame as pg
+from pygame import mixer, sndarray
+
+from pybeats.audio import HoldSoundBank
+from pybeats.memory import MemoryBudget, surface_size, surfaces_size
+
+
+class Holder:
+    def __init__(self) -> None:
+        self.bg = pg.Surface((10, 10))
+        self.lanes = [pg.Surface((4, 4)), pg.Surface((4, 4))]
+        self.texts = {"a": pg.Surface((2, 2))}
+        self.name = "not a surface"
+
+
+def test_surfaces_size() -> None:
+    holder = Holder()
+    expected = surface_size(holder.bg) + 2 * surface_size(holder.lanes[0]) + surface_size(holder.texts["a"])
+    assert surfaces_size(holder) == expected
+
+
+def test_released_hold_sounds_are_evictable(tmp_path) -> None:
+    mixer.init(44100, -16, 2)
+    try:
+        base = sndarray.make_sound(numpy.zeros((4410, 2), numpy.int16))
+        budget = MemoryBudget(1 << 30)
+        bank = HoldSoundBank(str(tmp_path), base, 0.5, budget)
+        bank.preload([1, 2])
+
+        # Pinned sounds are never evicted, however far over budget
+        budget.max_bytes = 0
+        budget.enforce()
+        assert set(bank.sounds) == {1, 2}
+
+        bank.release()
+        assert not bank.sounds
+        assert budget.usage().get("sounds", 0) == 0
+
+        budget.max_bytes = 1 << 30
+        bank.pin()
+        bank.preload([1])
+        assert set(bank.sounds) == {1}
+    finally:
+        mixer.quit()
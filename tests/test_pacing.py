@@ -0,0 +1,27 @@
+from pybeats import pacing
+from pybeats.pacing import VSYNC_CHECK_FRAMES, FramePacer
+
+
+def run(pacer: FramePacer, frames: int, frame_time: float, monkeypatch) -> None:
+    now = [pacer.last]
+    monkeypatch.setattr(pacing.time, "perf_counter", lambda: now[0])
+    for _ in range(frames):
+        now[0] += frame_time
+        pacer.tick()
+
+
+def test_ignored_vsync_is_caught_after_slow_frames(monkeypatch) -> None:
+    pacer = FramePacer("vsync", 60)
+
+    # Loading; far too slow to tell anything from
+    run(pacer, VSYNC_CHECK_FRAMES, 0.1, monkeypatch)
+    assert pacer.mode == "vsync"
+
+    run(pacer, VSYNC_CHECK_FRAMES, 0.0005, monkeypatch)
+    assert pacer.mode == "precise"
+
+
+def test_working_vsync_is_kept(monkeypatch) -> None:
+    pacer = FramePacer("vsync", 60)
+    run(pacer, VSYNC_CHECK_FRAMES * 3, 1 / 144, monkeypatch)
+    assert pacer.mode == "vsync"
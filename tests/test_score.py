@@ -0,0 +1,26 @@
+from pybeats.score import Score
+
+
+def test_each_note_is_judged_once() -> None:
+    score = Score(2)
+
+    score.judge("a", "PERFECT")
+    score.judge("a", "GREAT")
+    assert score.total == 1
+    assert not score.finished
+
+    score.judge("b", "EARLY")
+    assert score.finished
+    assert score.counts == {"PERFECT": 1, "GREAT": 0, "EARLY": 1, "MISS": 0}
+
+
+def test_revoke_takes_back_that_note() -> None:
+    score = Score(2)
+    score.judge("hold", "EARLY")
+    score.judge("tap", "PERFECT")
+
+    score.revoke("hold")
+    assert score.counts == {"PERFECT": 1, "GREAT": 0, "EARLY": 0, "MISS": 1}
+    assert score.total == 2
+    assert score.combo == 0
+    assert score.accuracy == 50.0
@@ -0,0 +1,156 @@
+import os
+import time
+from multiprocessing import shared_memory
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame as pg
+import pytest
+
+from pybeats.memory import MemoryBudget
+from pybeats.video import (
+    PACKED_HEADER,
+    PACKED_MAGIC,
+    PACKED_OFFSET,
+    FrameDirectory,
+    PackedFrames,
+    SharedMemoryVideo,
+    Video,
+    pack_frames,
+)
+
+SIZE = (32, 18)
+
+
+class Ctx:
+    SCREEN_WIDTH, SCREEN_HEIGHT = SIZE
+
+    def __init__(self) -> None:
+        self.memory = MemoryBudget(1 << 30)
+
+
+def colour(idx: int):
+    return ((idx * 40) % 256, (idx * 90) % 256, (idx * 150) % 256)
+
+
+def close_to(a, b) -> bool:
+    # Frames go through JPEG, which doesn't keep flat colours exact
+    return all(abs(x - y) <= 12 for x, y in zip(a, b))
+
+
+@pytest.fixture
+def frame_dir(tmp_path) -> str:
+    for idx in range(1, 121):
+        surface = pg.Surface(SIZE)
+        surface.fill(colour(idx))
+        pg.image.save(surface, str(tmp_path / f"mv{idx}.jpg"))
+    return str(tmp_path)
+
+
+def test_packed_frames_match_the_directory(frame_dir, tmp_path) -> None:
+    out = str(tmp_path / "mv.pbv")
+    assert pack_frames(frame_dir, "mv", out) == 120
+
+    packed = PackedFrames(out)
+    frames = FrameDirectory(frame_dir, "mv")
+    assert len(packed) == 120
+    for idx in (1, 60, 120):
+        with open(frames[idx], "rb") as f:
+            assert packed[idx] == f.read()
+    packed.close()
+
+
+def test_packed_frames_bounds(frame_dir, tmp_path) -> None:
+    out = str(tmp_path / "mv.pbv")
+    pack_frames(frame_dir, "mv", out)
+
+    packed = PackedFrames(out)
+    for idx in (0, 121):
+        with pytest.raises(IndexError):
+            packed[idx]
+    packed.close()
+
+
+def test_empty_packed_frames(tmp_path) -> None:
+    empty = tmp_path / "empty.pbv"
+    empty.write_bytes(PACKED_HEADER.pack(PACKED_MAGIC, 0) + PACKED_OFFSET.pack(PACKED_HEADER.size + PACKED_OFFSET.size))
+
+    packed = PackedFrames(str(empty))
+    assert len(packed) == 0
+    with pytest.raises(IndexError):
+        packed[1]
+    packed.close()
+
+    os.mkdir(tmp_path / "no_frames")
+    with pytest.raises(FileNotFoundError):
+        pack_frames(str(tmp_path / "no_frames"), "mv", str(tmp_path / "no_frames.pbv"))
+
+
+def test_truncated_packed_frames(frame_dir, tmp_path) -> None:
+    out = tmp_path / "mv.pbv"
+    pack_frames(frame_dir, "mv", str(out))
+
+    # Claims 120 frames but the offset table is cut off
+    out.write_bytes(out.read_bytes()[: PACKED_HEADER.size + 10 * PACKED_OFFSET.size])
+    with pytest.raises(ValueError):
+        PackedFrames(str(out))
+
+    out.write_bytes(b"PB")
+    with pytest.raises(ValueError):
+        PackedFrames(str(out))
+
+
+def position(video: Video, idx: int) -> int:
+    # The first millisecond of frame idx
+    return -(-(idx - 1) * 1000 // video.fps)
+
+
+def wait_for(video: Video, idx: int) -> pg.Surface:
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if (frame := video.frame_at(position(video, idx))) is not None and video.shown == idx:
+            return frame
+        time.sleep(0.01)
+    raise AssertionError(f"frame {idx} was never decoded")
+
+
+def test_shared_memory_frames_never_tear(frame_dir) -> None:
+    video = SharedMemoryVideo(Ctx(), FrameDirectory(frame_dir, "mv"))
+    video.start()
+    name = video.shm.name
+
+    shown = wait_for(video, 1)
+    assert close_to(shown.get_at((0, 0)), colour(1))
+
+    # Jumping a whole buffer ahead makes the decoder skip to a frame that lives in the slot still on screen
+    video.frame_at(position(video, video.capacity + 1))
+    time.sleep(1)
+    assert video.shown == 1
+    assert close_to(shown.get_at((0, 0)), colour(1))
+
+    for idx in range(video.capacity + 2, 121):
+        frame = wait_for(video, idx)
+        assert close_to(frame.get_at((SIZE[0] - 1, SIZE[1] - 1)), colour(idx))
+    del frame, shown
+
+    video.unload()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_bad_frames_are_dropped(frame_dir, capsys) -> None:
+    pg.display.set_mode((1, 1))
+    with open(os.path.join(frame_dir, "mv3.jpg"), "wb") as f:
+        f.write(b"not a jpeg")
+
+    video = Video(Ctx(), FrameDirectory(frame_dir, "mv"))
+    video.start()
+
+    wait_for(video, 2)
+    # The decoder keeps going past the frame it couldn't read
+    frame = wait_for(video, 4)
+    assert close_to(frame.get_at((0, 0))[:3], colour(4))
+    assert video.shown == 4
+    assert "MV frame 3" in capsys.readouterr().out
+
+    video.unload()